@@ -8,20 +8,92 @@ import sys
 import hashlib
 import concurrent.futures
 import uuid
+import csv
+import shutil
+import tempfile
+import itertools
+import math
+import random
+import argparse
+import platform
+import multiprocessing
+import mmap
+import struct
+import zlib
+import atexit
+import queue
+import sqlite3
+import bisect
+import asyncio
+import contextlib
+import contextvars
+import email.utils
+import http.server
+try:
+    import resource
+except ImportError:
+    resource = None # Windows: kein Peak-RSS im Benchmark
 from collections import deque
-from datetime import datetime, timezone
-from flask import Flask, render_template_string, request, redirect, url_for, jsonify
+from datetime import datetime, timezone, timedelta
+from flask import Flask, Response, stream_with_context, render_template, request, redirect, url_for, jsonify
+from jinja2 import DictLoader
+
+# NumPy ist optional: ohne NumPy laufen die Filter als normale Python-Schleife
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# aiohttp ist optional und wird nur für engine_mode "async" gebraucht
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Brotli ist optional: ohne Paket wird nur gzip/deflate ausgehandelt
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- KONFIGURATION ---
 DATA_FILE = "polybot_data.json"
+DB_FILE = "polybot_data.db"
 CONFIG_FILE = "polybot_config.json"
 REMOTE_URL = "https://raw.githubusercontent.com/Sayen/PolyBotSym/refs/heads/main/polybot.py"
 
 # Globale Server-Einstellungen
 GLOBAL_CONFIG = {
     "port": 5111,
+    "api_base_url": "https://gamma-api.polymarket.com", # Gamma API; für Lasttests z.B. http://127.0.0.1:8800 (gamma-standin)
     "api_fetch_limit": 3000,
     "check_interval": 30,
+    "monitor_interval": 0, # Sekunden; >0 = offene Wetten im eigenen schnellen Takt, Scan nur noch für neue Märkte (Neustart nötig)
+    "price_feed": False, # Preis-Ticks per Websocket direkt auf offene Wetten (braucht aiohttp), Polling bleibt als Rückfallebene
+    "price_feed_url": "wss://ws-subscriptions-clob.polymarket.com/ws/market",
+    "bet_refresh_mode": "scan", # "scan" = Wetten aus dem Markt-Scan aktualisieren, "single" = ein GET pro Wette
+    "engine_mode": "thread", # "thread" = ThreadPoolExecutor, "async" = asyncio + aiohttp
+    "async_concurrency": 100, # Max. gleichzeitige Requests je Semaphore im Async-Modus
+    "max_concurrency": 20, # Obergrenze paralleler Requests im Thread-Modus (Thread-Pools & AIMD-Limit)
+    "api_rate_limit": 0, # Requests pro Sekunde über alle Endpunkte (Token-Bucket), 0 = unbegrenzt (nur AIMD & Retry-After)
+    "retry_deadline": 15, # Sekunden ab Zyklusbeginn, in denen 429/5xx/Timeouts wiederholt werden
+    "connect_timeout": 3.05, # Sekunden für den Verbindungsaufbau (TCP + TLS)
+    "read_timeout": 10, # Sekunden Funkstille beim Lesen der Antwort
+    "hedge_requests": False, # Markt-Seite ohne Antwort bis zur p95-Latenz ein zweites Mal anfragen, erste Antwort gewinnt
+    "hedge_budget": 0.05, # Max. Anteil zusätzlicher Seiten-Requests durch Hedging
+    "fetch_horizon": True, # Scan endet nach der größten max_time_min der laufenden Strategien
+    "pagination_mode": "offset", # "offset" = parallele Offset-Seiten, "keyset" = sequentiell per endDate-Cursor
+    "scan_pipeline": False, # Jede Seite sofort parsen & bewerten statt auf den kompletten Scan zu warten
+    "storage_backend": "sqlite", # "sqlite" = inkrementell in polybot_data.db, "json" = komplette polybot_data.json
+    "record_snapshots": False, # Scans & Wetten-Updates für Backtests auf Disk aufzeichnen
+    "record_dir": "recordings",
     "debug": False
 }
 
@@ -47,6 +119,241 @@ def sys_log(msg):
     ts = datetime.now().strftime("%H:%M:%S")
     print(f"[SYSTEM] {msg}")
     log_buffer.appendleft(f"[{ts}] {msg}")
+    state_bus.bump("logs")
+
+# --- DASHBOARD PUSH (SSE) ---
+class StateBus:
+    """Versionszähler je Thema; SSE-Streams schlafen, bis sich eine ihrer Versionen ändert"""
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.versions = {}
+        self.fingerprints = {}
+
+    def bump(self, topic):
+        with self.cond:
+            self.versions[topic] = self.versions.get(topic, 0) + 1
+            self.cond.notify_all()
+
+    def publish(self, topic, fingerprint):
+        """Neue Version nur, wenn sich der Zustand wirklich geändert hat"""
+        with self.cond:
+            if self.fingerprints.get(topic) == fingerprint: return
+            self.fingerprints[topic] = fingerprint
+            self.versions[topic] = self.versions.get(topic, 0) + 1
+            self.cond.notify_all()
+
+    def wait(self, seen, timeout):
+        """Wartet, bis ein Thema aus seen eine neue Version hat; liefert {Thema: Version} der geänderten"""
+        with self.cond:
+            changed = lambda: {t: self.versions.get(t, 0) for t, v in seen.items() if self.versions.get(t, 0) != v}
+            self.cond.wait_for(changed, timeout)
+            return changed()
+
+state_bus = StateBus()
+
+# --- METRIKEN (Prometheus Textformat) ---
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Metrics:
+    """Histogramme, Zähler und Gauges für /metrics (ohne prometheus_client, threadsicher)"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.meta = {} # Name -> (Typ, Hilfetext)
+        self.values = {} # Name -> {Labels: Wert bzw. [Bucket-Zähler..., Überlauf, Summe, Anzahl]}
+
+    def describe(self, name, kind, text):
+        self.meta[name] = (kind, text)
+        self.values.setdefault(name, {})
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            h = self.values[name].get(key)
+            if h is None: h = self.values[name][key] = [0] * (len(METRIC_BUCKETS) + 3)
+            # Nicht-kumulativ, kumuliert wird beim Export; Werte über dem letzten Bucket landen im Überlauf (nur +Inf)
+            h[bisect.bisect_left(METRIC_BUCKETS, value)] += 1
+            h[-2] += value
+            h[-1] += 1
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock: self.values[name][key] = self.values[name].get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock: self.values[name][tuple(sorted(labels.items()))] = value
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        t0 = time.perf_counter()
+        try: yield
+        finally: self.observe(name, time.perf_counter() - t0, **labels)
+
+    def render(self):
+        def fmt(labels, extra=()):
+            items = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+        out = []
+        with self.lock:
+            for name, (kind, text) in self.meta.items():
+                out.append(f"# HELP {name} {text}")
+                out.append(f"# TYPE {name} {kind}")
+                for labels, v in self.values[name].items():
+                    if kind != "histogram":
+                        out.append(f"{name}{fmt(labels)} {v}")
+                        continue
+                    acc = 0
+                    for bound, n in zip(METRIC_BUCKETS, v):
+                        acc += n
+                        out.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {acc}")
+                    out.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {v[-1]}")
+                    out.append(f"{name}_sum{fmt(labels)} {v[-2]}")
+                    out.append(f"{name}_count{fmt(labels)} {v[-1]}")
+        return "\n".join(out) + "\n"
+
+metrics = Metrics()
+metrics.describe("polybot_phase_seconds", "histogram", "Dauer der Engine-Phasen (fetch_markets, fetch_batch, update_active_bets, preprocess, evaluate, save_data, cycle, first_decision, monitor, price_tick)")
+metrics.describe("polybot_gamma_request_seconds", "histogram", "Latenz der Gamma API Aufrufe nach Endpunkt und HTTP Status")
+metrics.describe("polybot_markets_scanned", "gauge", "Märkte im letzten Scan")
+metrics.describe("polybot_open_bets", "gauge", "Offene Wetten aller Strategien")
+metrics.describe("polybot_strategies_running", "gauge", "Laufende Strategien")
+metrics.describe("polybot_cycle_duration_seconds", "gauge", "Dauer des letzten Zyklus")
+metrics.describe("polybot_cycle_overrun_seconds", "gauge", "Überschreitung von check_interval im letzten Zyklus (0 = im Takt)")
+metrics.describe("polybot_cycle_overruns_total", "counter", "Zyklen, die länger als check_interval gedauert haben")
+metrics.describe("polybot_schedule_lag_seconds", "gauge", "Verspäteter Start des letzten Laufs gegenüber dem festen Takt")
+metrics.describe("polybot_schedule_overruns_total", "counter", "Läufe, die über ihren nächsten Takt hinaus gedauert haben")
+metrics.describe("polybot_monitor_deferred_markets", "gauge", "Märkte, die der letzte Monitor-Lauf bis zum nächsten Takt nicht mehr geschafft hat")
+metrics.describe("polybot_price_feed_connected", "gauge", "1 = Websocket-Preis-Feed verbunden, 0 = nur Polling")
+metrics.describe("polybot_price_feed_reconnects_total", "counter", "Verbindungsabbrüche des Preis-Feeds")
+metrics.describe("polybot_price_ticks_total", "counter", "Preis-Ticks, die auf offene Wetten angewendet wurden")
+metrics.describe("polybot_governor_limit", "gauge", "Aktuelles AIMD-Limit paralleler Gamma-Requests")
+metrics.describe("polybot_governor_pauses_total", "counter", "Pausen wegen Retry-After")
+metrics.describe("polybot_gamma_retries_total", "counter", "Wiederholte Gamma-Requests nach 429/5xx/Netzwerkfehler")
+metrics.describe("polybot_http_requests_total", "counter", "HTTP-Requests über den Engine-Transport (sync = requests, async = aiohttp)")
+metrics.describe("polybot_http_connections_total", "counter", "Neu aufgebaute HTTP-Verbindungen; Wiederverwendung = 1 - connections/requests")
+metrics.describe("polybot_hedges_total", "counter", "Doppelt angefragte Markt-Seiten (Hedging)")
+metrics.describe("polybot_hedge_wins_total", "counter", "Markt-Seiten, bei denen das Duplikat zuerst geantwortet hat")
+metrics.describe("polybot_hedge_delay_seconds", "gauge", "Aktuelle Wartezeit bis zum Duplikat (p95 der Seiten-Latenz)")
+metrics.describe("polybot_http_discarded_total", "counter", "Verbindungen, die bei vollem Pool geschlossen statt zurückgelegt wurden")
+
+# --- SAMPLING PROFILER (Debug) ---
+PROFILER_INTERVAL = 0.01 # Sekunden zwischen zwei Stichproben
+
+class SamplingProfiler:
+    """Stichproben-Profiler über sys._current_frames(): nur Engine-Zyklen und laufende Flask-Requests, zur Laufzeit schaltbar"""
+    def __init__(self, interval=PROFILER_INTERVAL, keep_cycles=20):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.running = False
+        self.active = {} # Thread-ID -> Rolle ("engine", "flask"), solange der Thread arbeitet
+        self.labels = {} # Code-Objekt -> "funktion (datei:zeile)"
+        self.total = {} # Collapsed Stack -> Stichproben seit Start
+        self.window = {} # Collapsed Stack -> Stichproben im laufenden Zyklus
+        self.cycles = deque(maxlen=keep_cycles) # (Uhrzeit, Dauer, {Stack: Stichproben})
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        threading.Thread(target=self.loop, name="profiler", daemon=True).start()
+        sys_log(f"DEBUG Profiler gestartet ({1 / self.interval:.0f} Hz).")
+
+    def stop(self):
+        if not self.running: return
+        self.running = False
+        self.active.clear()
+        sys_log("DEBUG Profiler gestoppt.")
+
+    def enter(self, role):
+        if self.running: self.active[threading.get_ident()] = role
+
+    def leave(self):
+        self.active.pop(threading.get_ident(), None)
+
+    @contextlib.contextmanager
+    def track(self, role):
+        self.enter(role)
+        try: yield
+        finally: self.leave()
+
+    def label(self, code):
+        lbl = self.labels.get(code)
+        if lbl is None: lbl = self.labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return lbl
+
+    def collapse(self, frame):
+        if frame.f_code.co_name == "_worker": return None # Leerlaufender Pool-Thread
+        stack = []
+        while frame is not None:
+            stack.append(self.label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def loop(self):
+        me = threading.get_ident()
+        while self.running:
+            time.sleep(self.interval)
+            active = self.active.copy()
+            if not active: continue
+            frames = sys._current_frames()
+            # Während eines Engine-Zyklus auch die Fetch-Pools der Engine mitnehmen
+            pools = set()
+            if "engine" in active.values():
+                pools = {t.ident for t in threading.enumerate() if t.name.startswith("ThreadPoolExecutor")}
+            with self.lock:
+                for ident, frame in frames.items():
+                    role = active.get(ident) or ("engine-pool" if ident in pools else None)
+                    if role is None or ident == me: continue
+                    stack = self.collapse(frame)
+                    if stack is None: continue
+                    key = f"{role};{stack}"
+                    self.window[key] = self.window.get(key, 0) + 1
+                    self.total[key] = self.total.get(key, 0) + 1
+
+    def cycle_done(self, duration):
+        if not self.running: return
+        with self.lock:
+            self.cycles.append((datetime.now().strftime("%H:%M:%S"), duration, self.window))
+            self.window = {}
+
+    def collapsed(self, cycles=None):
+        """Flamegraph-Format (flamegraph.pl, speedscope): "rolle;f1;f2 anzahl" je Zeile"""
+        with self.lock:
+            if cycles: sources = [c[2] for c in list(self.cycles)[-cycles:]]
+            else: sources = [self.total]
+            merged = {}
+            for counts in sources:
+                for stack, n in counts.items(): merged[stack] = merged.get(stack, 0) + n
+        return "".join(f"{stack} {n}\n" for stack, n in sorted(merged.items(), key=lambda x: -x[1]))
+
+    @staticmethod
+    def hot(counts, n):
+        """Top-N Funktionen: eigene Stichproben (Blatt) und inklusive (irgendwo im Stack)"""
+        own, incl = {}, {}
+        for stack, c in counts.items():
+            frames = stack.split(";")[1:]
+            own[frames[-1]] = own.get(frames[-1], 0) + c
+            for f in set(frames): incl[f] = incl.get(f, 0) + c
+        top = lambda d: sorted(d.items(), key=lambda x: -x[1])[:n]
+        return top(own), top(incl)
+
+    def report(self, n=15, cycles=5):
+        with self.lock:
+            recent = list(self.cycles)[-cycles:]
+        out = [f"Profiler: {'AKTIV' if self.running else 'AUS'}, {1 / self.interval:.0f} Hz, {len(self.cycles)} Zyklen gespeichert", ""]
+        for ts, duration, counts in reversed(recent):
+            samples = sum(counts.values())
+            out.append(f"=== Zyklus {ts} | {duration:.2f}s | {samples} Stichproben ===")
+            if not samples:
+                out.append("")
+                continue
+            own, incl = self.hot(counts, n)
+            out.append(f"{'eigen':>7} {'%':>6}  Funktion")
+            out += [f"{c:>7} {c / samples * 100:>5.1f}%  {f}" for f, c in own]
+            out.append(f"{'inkl.':>7} {'%':>6}  Funktion")
+            out += [f"{c:>7} {c / samples * 100:>5.1f}%  {f}" for f, c in incl]
+            out.append("")
+        return "\n".join(out) + "\n"
+
+profiler = SamplingProfiler()
 
 # --- CONFIG MANAGEMENT ---
 def save_config():
@@ -120,12 +427,15 @@ def perform_update_logic():
 
 def restart_server():
     sys_log("♻️ Server wird neu gestartet...")
+    flush_data()
     time.sleep(1)
     os.execv(sys.executable, ['python'] + sys.argv)
 
 # --- STRATEGIE KLASSE ---
 class Strategy:
     def __init__(self, data=None):
+        # Schreibzugriffe (Engine & Routen) auf diese Strategie laufen unter ihrem Lock, UI-Leser nutzen snapshot()
+        self._lock = threading.RLock()
         if data:
             self.__dict__.update(data)
             if not hasattr(self, 'initial_balance'):
@@ -180,32 +490,273 @@ class Strategy:
         return self.balance + portfolio_val
 
     def to_dict(self):
-        return self.__dict__
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def snapshot(self, prev=None):
+        """Unveränderliche Kopie für UI-Leser; die Historie wird nur bei Änderung neu kopiert"""
+        with self._lock:
+            snap = Strategy.__new__(Strategy)
+            snap.__dict__.update(self.to_dict())
+            snap.active_bets = [dict(b) for b in self.active_bets]
+            snap.logs = list(self.logs)
+            hist_key = (id(self.history), len(self.history))
+            snap.history = prev.history if prev is not None and prev._hist_key == hist_key else list(self.history)
+            snap._hist_key = hist_key
+        return snap
 
 # --- DATA MANAGER ---
+# Copy-on-Write: das dict wird nie verändert, sondern unter strategies_lock ersetzt (Engine iteriert gefahrlos)
 strategies = {}
-
+strategies_lock = threading.Lock()
+dashboard_view = {} # Letzter veröffentlichter Snapshot (id -> Strategy-Kopie), Quelle aller UI-Lesezugriffe
+
+class SqliteStore:
+    """SQLite (WAL) Speicher: schreibt nur geänderte Zeilen, gebündelt in einem Hintergrund-Thread"""
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock() # Schützt die Diff-Caches bei gleichzeitigen save_data() Aufrufen
+        self.queue = queue.Queue()
+        self._order = []
+        self._core = {} # s_id -> JSON der Strategie ohne Wetten/Historie
+        self._bets = {} # s_id -> {market_id: JSON}
+        self._hist = {} # s_id -> (id der Historie-Liste, Anzahl gespeicherter Einträge)
+
+        con = self.connect()
+        con.executescript("""
+            CREATE TABLE IF NOT EXISTS strategies (id TEXT PRIMARY KEY, position INTEGER, data TEXT);
+            CREATE TABLE IF NOT EXISTS bets (strategy_id TEXT, market_id TEXT, data TEXT, PRIMARY KEY (strategy_id, market_id));
+            CREATE TABLE IF NOT EXISTS history (strategy_id TEXT, seq INTEGER, data TEXT, PRIMARY KEY (strategy_id, seq));
+        """)
+        con.close()
+        threading.Thread(target=self.writer, daemon=True).start()
+
+    def connect(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    def load(self):
+        """Liest alle Strategien inkl. Wetten & Historie (Reihenfolge wie gespeichert)"""
+        con = self.connect()
+        try:
+            raw = {}
+            for s_id, data in con.execute("SELECT id, data FROM strategies ORDER BY position"):
+                d = json.loads(data)
+                d["active_bets"], d["history"] = [], []
+                raw[s_id] = d
+            for s_id, data in con.execute("SELECT strategy_id, data FROM bets ORDER BY rowid"):
+                if s_id in raw: raw[s_id]["active_bets"].append(json.loads(data))
+            for s_id, data in con.execute("SELECT strategy_id, data FROM history ORDER BY strategy_id, seq"):
+                if s_id in raw: raw[s_id]["history"].append(json.loads(data))
+            return raw
+        finally:
+            con.close()
+
+    def sync(self, strategy_map, prime=False):
+        """Ermittelt die Änderungen seit dem letzten Aufruf und reiht sie für den Writer ein
+        (prime=True: nur die Diff-Caches auf den geladenen Stand setzen, nichts schreiben)"""
+        with self.lock:
+            ops = []
+            order = list(strategy_map.keys())
+            if order != self._order:
+                ops.append(("order", order))
+                self._order = order
+
+            for s_id in list(self._core.keys() - set(order)):
+                ops.append(("delete", s_id))
+                self._core.pop(s_id, None); self._bets.pop(s_id, None); self._hist.pop(s_id, None)
+
+            for pos, (s_id, strat) in enumerate(list(strategy_map.items())):
+                with strat._lock: self.diff_strategy(ops, pos, s_id, strat)
+
+            if ops and not prime: self.queue.put(ops)
+
+    def diff_strategy(self, ops, pos, s_id, strat):
+        """Diff einer Strategie (Aufrufer hält ihren Lock)"""
+        d = strat.to_dict()
+        core = json.dumps({k: v for k, v in d.items() if k not in ("active_bets", "history")})
+        if self._core.get(s_id) != core:
+            ops.append(("strategy", s_id, pos, core))
+            self._core[s_id] = core
+
+        # Historie ist append-only; reset_stats() ersetzt die Liste komplett
+        hist = strat.history
+        list_id, known = self._hist.get(s_id, (None, 0))
+        if list_id != id(hist) or known > len(hist):
+            if list_id is not None: ops.append(("history_clear", s_id))
+            known = 0
+        for seq in range(known, len(hist)):
+            ops.append(("history", s_id, seq, json.dumps(hist[seq])))
+        self._hist[s_id] = (id(hist), len(hist))
+
+        bets = {str(b["market_id"]): json.dumps(b) for b in strat.active_bets}
+        prev = self._bets.get(s_id, {})
+        for mid, data in bets.items():
+            if prev.get(mid) != data: ops.append(("bet", s_id, mid, data))
+        for mid in prev.keys() - bets.keys():
+            ops.append(("bet_delete", s_id, mid))
+        self._bets[s_id] = bets
+
+    def writer(self):
+        con = self.connect()
+        # Die Diff-Caches sind beim Einreihen schon weitergezählt: eine fehlgeschlagene Transaktion wird deshalb
+        # nicht verworfen, sondern vor allen neueren Änderungen wiederholt (Reihenfolge bleibt erhalten)
+        failed, done = [], 0
+        while True:
+            batch = []
+            try:
+                batch = self.queue.get(block=not failed)
+                done += 1
+            except queue.Empty: pass
+            # Alles, was inzwischen aufgelaufen ist, in derselben Transaktion schreiben
+            while True:
+                try: batch = batch + self.queue.get_nowait(); done += 1
+                except queue.Empty: break
+            batch = failed + batch
+            try:
+                with con:
+                    for op in batch: self.apply(con, op)
+            except Exception as e:
+                if not failed: sys_log(f"Fehler beim Speichern (SQLite): {e} – wird wiederholt.")
+                failed = batch
+                time.sleep(1)
+                continue
+            if failed: sys_log("SQLite: ausstehende Änderungen nachgeschrieben.")
+            failed = []
+            for _ in range(done): self.queue.task_done()
+            done = 0
+
+    def apply(self, con, op):
+        kind = op[0]
+        if kind == "strategy":
+            con.execute("INSERT INTO strategies (id, position, data) VALUES (?, ?, ?) ON CONFLICT(id) DO UPDATE SET position=excluded.position, data=excluded.data", op[1:])
+        elif kind == "order":
+            con.executemany("UPDATE strategies SET position=? WHERE id=?", [(pos, s_id) for pos, s_id in enumerate(op[1])])
+        elif kind == "bet":
+            con.execute("INSERT INTO bets (strategy_id, market_id, data) VALUES (?, ?, ?) ON CONFLICT(strategy_id, market_id) DO UPDATE SET data=excluded.data", op[1:])
+        elif kind == "bet_delete":
+            con.execute("DELETE FROM bets WHERE strategy_id=? AND market_id=?", op[1:])
+        elif kind == "history":
+            con.execute("INSERT OR REPLACE INTO history (strategy_id, seq, data) VALUES (?, ?, ?)", op[1:])
+        elif kind == "history_clear":
+            con.execute("DELETE FROM history WHERE strategy_id=?", op[1:])
+        elif kind == "delete":
+            for table, col in (("strategies", "id"), ("bets", "strategy_id"), ("history", "strategy_id")):
+                con.execute(f"DELETE FROM {table} WHERE {col}=?", op[1:])
+
+    def flush(self, timeout=30):
+        """Wartet, bis alle eingereihten Änderungen geschrieben sind; False = bei anhaltenden Schreibfehlern nach timeout Sekunden aufgegeben"""
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                left = deadline - time.monotonic()
+                if left <= 0: return False
+                self.queue.all_tasks_done.wait(left)
+        return True
+
+store = None
+
+def get_store():
+    global store
+    if store is None and GLOBAL_CONFIG.get("storage_backend", "sqlite") == "sqlite":
+        store = SqliteStore(DB_FILE)
+    return store
+
+def flush_data():
+    if store is not None: store.flush()
+
+@metrics.timer("polybot_phase_seconds", phase="save_data")
 def save_data():
+    publish_dashboard()
     try:
-        data = {id: s.to_dict() for id, s in strategies.items()}
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
+        db = get_store()
+        if db is not None:
+            # Nur geänderte Zeilen, geschrieben vom Hintergrund-Thread
+            db.sync(strategies)
+        else:
+            # Konsistenter Stand aus dem gerade veröffentlichten Snapshot
+            data = {id: s.to_dict() for id, s in dashboard_view.items()}
+            with open(DATA_FILE, 'w') as f:
+                json.dump(data, f, indent=4)
     except Exception as e:
         sys_log(f"Fehler beim Speichern: {e}")
 
+publish_lock = threading.Lock()
+
+def publish_dashboard():
+    """Neuen Snapshot für die UI veröffentlichen und Fingerabdrücke der Fragmente an den state_bus melden"""
+    global dashboard_view
+    with publish_lock:
+        prev = dashboard_view
+        dashboard_view = {s_id: s.snapshot(prev.get(s_id)) for s_id, s in list(strategies.items())}
+        rows = []
+        for s_id, s in dashboard_view.items():
+            bets = tuple((b["market_id"], b.get("current_price"), b.get("time_str"), b["amount"]) for b in s.active_bets)
+            stats = (round(s.get_equity(), 2), round(s.balance, 2), len(bets), s.wins, s.losses)
+            state_bus.publish(f"stats:{s_id}", stats)
+            state_bus.publish(f"active:{s_id}", bets)
+            state_bus.publish(f"history:{s_id}", s._hist_key)
+            state_bus.publish(f"logs:{s_id}", (len(s.logs), s.logs[0] if s.logs else None))
+            rows.append((s_id, s.name, s.is_running, s.category_filter, s.min_prob, s.max_prob, s.max_time_min,
+                         s.bet_percentage, s.min_liquidity, s.stop_loss_trigger) + stats)
+        state_bus.publish("strategies", tuple(rows))
+        state_bus.publish("navbar", (GLOBAL_CONFIG['api_fetch_limit'], UPDATE_AVAILABLE))
+
 def load_data():
     global strategies
+    db = get_store()
+    if db is not None:
+        try:
+            raw = db.load()
+            if not raw and os.path.exists(DATA_FILE):
+                raw = migrate_json_to_sqlite(db)
+            strategies = {id: Strategy(data) for id, data in raw.items()}
+            # Diff-Caches auf den geladenen Stand setzen, ohne alles neu zu schreiben
+            db.sync(strategies, prime=True)
+            sys_log(f"{len(strategies)} Strategien geladen (SQLite).")
+        except Exception as e:
+            sys_log(f"Ladefehler: {e}")
+        return
     if os.path.exists(DATA_FILE):
         try:
             with open(DATA_FILE, 'r') as f:
                 raw = json.load(f)
-                strategies = {}
-                for id, data in raw.items():
-                    strategies[id] = Strategy(data)
+                strategies = {id: Strategy(data) for id, data in raw.items()}
             sys_log(f"{len(strategies)} Strategien geladen.")
         except Exception as e:
             sys_log(f"Ladefehler: {e}")
 
+def read_strategy_configs():
+    """Gespeicherte Strategien nur lesen (Replay): DB read-only, sonst die JSON-Datei; nie anlegen oder migrieren"""
+    if GLOBAL_CONFIG.get("storage_backend", "sqlite") == "sqlite" and os.path.exists(DB_FILE):
+        try:
+            con = sqlite3.connect(f"file:{DB_FILE}?mode=ro", uri=True, timeout=30)
+            try:
+                raw = {s_id: json.loads(data) for s_id, data in con.execute("SELECT id, data FROM strategies ORDER BY position")}
+            finally:
+                con.close()
+            if raw: return raw
+        except sqlite3.Error as e:
+            sys_log(f"Ladefehler (SQLite, read-only): {e}")
+    if os.path.exists(DATA_FILE):
+        try:
+            with open(DATA_FILE, 'r') as f: return json.load(f)
+        except (OSError, ValueError) as e:
+            sys_log(f"Ladefehler: {e}")
+    return {}
+
+def migrate_json_to_sqlite(db):
+    """Übernimmt einmalig die bestehende polybot_data.json in die SQLite Datenbank"""
+    with open(DATA_FILE, 'r') as f:
+        raw = json.load(f)
+    db.sync({id: Strategy(data) for id, data in raw.items()})
+    # JSON nur wegräumen, wenn die Daten wirklich in der Datenbank stehen
+    if not db.flush(): raise RuntimeError(f"Migration nach {DB_FILE} nicht geschrieben, {DATA_FILE} bleibt erhalten")
+    os.replace(DATA_FILE, DATA_FILE + ".migrated")
+    sys_log(f"Migration: {len(raw)} Strategien aus {DATA_FILE} nach {DB_FILE} übernommen.")
+    return db.load()
+
 # --- FLASK SERVER ---
 app = Flask(__name__)
 app.secret_key = "polybot_secret"
@@ -320,6 +871,7 @@ HTML_BASE = """
     <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/bootstrap-icons.css">
     <script src="https://cdnjs.cloudflare.com/ajax/libs/Sortable/1.15.0/Sortable.min.js"></script>
     <script src="https://unpkg.com/htmx.org@1.9.6"></script>
+    <script src="https://unpkg.com/htmx.org@1.9.6/dist/ext/sse.js"></script>
     <style>
         body { background-color: #0d1117; font-family: 'Segoe UI', monospace; color: #c9d1d9; }
         .navbar { background-color: #161b22; border-bottom: 1px solid #30363d; }
@@ -343,6 +895,7 @@ HTML_BASE = """
     </style>
 </head>
 <body hx-boost="true">
+<div hx-ext="sse" sse-connect="{{ events_url or '/events' }}">
     <nav class="navbar navbar-expand-lg navbar-dark px-4">
         <a class="navbar-brand fw-bold" href="/"><i class="bi bi-robot"></i> PolyBot <span class="text-primary">Pro Edition</span></a>
         <div class="mx-4">
@@ -352,16 +905,21 @@ HTML_BASE = """
                 <a href="/global_action/reset_all" class="btn btn-outline-warning btn-sm" onclick="return confirm('ALLES zurücksetzen?')"><i class="bi bi-arrow-counterclockwise"></i> Alles zurücksetzen</a>
                 <a href="/mass_edit" class="btn btn-outline-primary btn-sm"><i class="bi bi-list-check"></i> Massenbearbeitung</a>
                 <a href="/global_action/toggle_debug" class="btn btn-outline-{{ 'info' if debug_mode else 'secondary' }} btn-sm" title="Debug Modus umschalten"><i class="bi bi-bug"></i> Debug: {{ 'ON' if debug_mode else 'OFF' }}</a>
+                {% if debug_mode %}
+                <a href="/global_action/toggle_profiler" class="btn btn-outline-{{ 'info' if profiler_on else 'secondary' }} btn-sm" title="Sampling-Profiler umschalten"><i class="bi bi-speedometer2"></i> Profiler: {{ 'ON' if profiler_on else 'OFF' }}</a>
+                {% if profiler_on %}<a href="/debug/profile" target="_blank" hx-boost="false" class="btn btn-outline-info btn-sm" title="Hotspots je Zyklus"><i class="bi bi-fire"></i></a>{% endif %}
+                {% endif %}
             </div>
         </div>
-        <div class="ms-auto text-muted small" hx-get="/poll/navbar" hx-trigger="every 5s" hx-swap="innerHTML">
-            """ + HTML_NAVBAR_STATS + """
+        <div class="ms-auto text-muted small" sse-swap="navbar" hx-swap="innerHTML">
+            {{ navbar_stats|safe }}
         </div>
     </nav>
 
     <div class="container-fluid p-4">
         {{ content|safe }}
     </div>
+</div>
 
     <!-- Update Modal -->
     <div class="modal fade" id="updateModal" tabindex="-1">
@@ -460,6 +1018,15 @@ HTML_BASE = """
                 initSortable();
             }
         });
+
+        // SSE Swaps (Push vom Server) lösen kein beforeSwap/afterSwap aus
+        document.addEventListener("htmx:sseMessage", function(evt) {
+            document.querySelectorAll('.tooltip').forEach(function(el) { el.remove(); });
+            initTooltips();
+            if (evt.target.id === 'strategyList') {
+                initSortable();
+            }
+        });
     </script>
 </body>
 </html>
@@ -479,15 +1046,15 @@ HTML_HOME_CONTENT = """
                     <th>Status</th><th>Name</th><th>Gesamtwert</th><th>Verfügbar</th><th>Offen</th><th>S/N</th><th>Filter</th><th class="text-end">Aktionen</th>
                 </tr>
             </thead>
-            <tbody id="strategyList" hx-get="/poll/strategies" hx-trigger="every 2s" hx-swap="innerHTML">
-                """ + HTML_STRATEGIES_ROWS + """
+            <tbody id="strategyList" sse-swap="strategies" hx-swap="innerHTML">
+                {{ strategy_rows|safe }}
             </tbody>
         </table>
     </div>
 </div>
 <div class="card mt-4"><div class="card-header">System-Protokolle</div>
-    <div class="log-box" hx-get="/poll/logs" hx-trigger="every 2s" hx-swap="innerHTML">
-        """ + HTML_LOGS_ROWS + """
+    <div class="log-box" sse-swap="logs" hx-swap="innerHTML">
+        {{ log_rows|safe }}
     </div>
 </div>
 
@@ -518,8 +1085,8 @@ HTML_DETAIL_WRAPPER = """
     </div>
 </div>
 
-<div class="row g-3 mb-4" hx-get="/poll/strategy_stats/{{ strat.id }}" hx-trigger="every 2s" hx-swap="innerHTML">
-    """ + HTML_DETAIL_STATS + """
+<div class="row g-3 mb-4" sse-swap="stats" hx-swap="innerHTML">
+    {{ fragments.stats|safe }}
 </div>
 
 <ul class="nav nav-tabs mb-3" id="detailTabs">
@@ -530,13 +1097,13 @@ HTML_DETAIL_WRAPPER = """
 </ul>
 <div class="tab-content">
     <div class="tab-pane fade show active" id="active_tab">
-        <div class="card" hx-get="/poll/strategy_active/{{ strat.id }}" hx-trigger="every 2s" hx-swap="innerHTML">
-             """ + HTML_DETAIL_ACTIVE_BETS + """
+        <div class="card" sse-swap="active" hx-swap="innerHTML">
+             {{ fragments.active|safe }}
         </div>
     </div>
     <div class="tab-pane fade" id="history_tab">
-        <div class="card" hx-get="/poll/strategy_history/{{ strat.id }}" hx-trigger="every 5s" hx-swap="innerHTML">
-            """ + HTML_DETAIL_HISTORY + """
+        <div class="card" sse-swap="history" hx-swap="innerHTML">
+            {{ fragments.history|safe }}
         </div>
     </div>
     <div class="tab-pane fade" id="config_tab">
@@ -557,8 +1124,8 @@ HTML_DETAIL_WRAPPER = """
         </div>
     </div>
     <div class="tab-pane fade" id="logs_tab">
-        <div hx-get="/poll/strategy_logs/{{ strat.id }}" hx-trigger="every 2s" hx-swap="innerHTML">
-            """ + HTML_DETAIL_LOGS + """
+        <div sse-swap="strategy_logs" hx-swap="innerHTML">
+            {{ fragments.logs|safe }}
         </div>
     </div>
 </div>
@@ -707,76 +1274,187 @@ HTML_SETTINGS = """
 </form>
 """
 
+# Templates 1x beim Start kompilieren (Jinja cached sie per Name) statt render_template_string pro Request
+app.jinja_loader = DictLoader({
+    "base": HTML_BASE, "home": HTML_HOME_CONTENT, "detail": HTML_DETAIL_WRAPPER,
+    "mass_edit": HTML_MASS_EDIT, "settings": HTML_SETTINGS,
+    "navbar": HTML_NAVBAR_STATS, "strategies": HTML_STRATEGIES_ROWS, "logs": HTML_LOGS_ROWS,
+    "stats": HTML_DETAIL_STATS, "active": HTML_DETAIL_ACTIVE_BETS, "history": HTML_DETAIL_HISTORY, "strategy_logs": HTML_DETAIL_LOGS
+})
+for _name in app.jinja_loader.list_templates(): app.jinja_env.get_template(_name)
+
+# --- RENDER CACHE ---
+BOOT_ID = uuid.uuid4().hex[:8] # ETags aus einem früheren Prozess sind ungültig
+render_cache = {} # (Fragment, Strategie-ID) -> (Version, HTML, ETag)
+
+def fragment_context(name, s_id=None):
+    """Template & Variablen eines Dashboard-Fragments (mit s_id: Fragment der Detailseite)"""
+    if s_id is not None:
+        return ("strategy_logs" if name == "logs" else name), {"strat": dashboard_view[s_id]}
+    if name == "navbar":
+        return "navbar", {"global_limit": GLOBAL_CONFIG['api_fetch_limit'], "last_update": datetime.now().strftime("%H:%M:%S"), "update_available": UPDATE_AVAILABLE}
+    if name == "strategies": return "strategies", {"strategies": dashboard_view}
+    return "logs", {"sys_logs": log_buffer}
+
+def render_fragment(name, s_id=None):
+    """Rendert nur neu, wenn sich die state_bus Version des Fragments geändert hat; liefert (HTML, ETag)"""
+    topic = name if s_id is None else f"{name}:{s_id}"
+    version = state_bus.versions.get(topic, 0)
+    hit = render_cache.get((name, s_id))
+    if hit is None or hit[0] != version:
+        template, ctx = fragment_context(name, s_id)
+        hit = (version, render_template(template, **ctx), f"{BOOT_ID}-{topic}-{version}")
+        render_cache[(name, s_id)] = hit
+    return hit[1], hit[2]
+
+def fragment_response(name, s_id=None):
+    """Poll-Antwort mit ETag: 304 Not Modified, solange sich nichts geändert hat"""
+    html, etag = render_fragment(name, s_id)
+    resp = Response(html)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
+
+def render_page(template, events_url="/events", **ctx):
+    content = render_template(template, **ctx)
+    return render_template("base", content=content, global_limit=GLOBAL_CONFIG['api_fetch_limit'], debug_mode=GLOBAL_CONFIG.get('debug', False), profiler_on=profiler.running,
+                           navbar_stats=render_fragment("navbar")[0], events_url=events_url)
+
 # --- ROUTES ---
 @app.route("/")
 def home():
-    content = render_template_string(HTML_HOME_CONTENT, strategies=strategies, sys_logs=log_buffer, default_strategy=DEFAULT_STRATEGY_CONFIG)
-    navbar_stats = render_template_string(HTML_NAVBAR_STATS, global_limit=GLOBAL_CONFIG['api_fetch_limit'], last_update=datetime.now().strftime("%H:%M:%S"), update_available=UPDATE_AVAILABLE)
-    return render_template_string(HTML_BASE, content=content, global_limit=GLOBAL_CONFIG['api_fetch_limit'], debug_mode=GLOBAL_CONFIG.get('debug', False), last_update=datetime.now().strftime("%H:%M:%S"), navbar_stats=navbar_stats)
+    return render_page("home", events_url="/events?page=home", strategy_rows=render_fragment("strategies")[0],
+                       log_rows=render_fragment("logs")[0], default_strategy=DEFAULT_STRATEGY_CONFIG)
 
 @app.route("/poll/navbar")
 def poll_navbar():
-    return render_template_string(HTML_NAVBAR_STATS, global_limit=GLOBAL_CONFIG['api_fetch_limit'], last_update=datetime.now().strftime("%H:%M:%S"), update_available=UPDATE_AVAILABLE)
+    return fragment_response("navbar")
 
 @app.route("/poll/strategies")
 def poll_strategies():
-    return render_template_string(HTML_STRATEGIES_ROWS, strategies=strategies)
+    return fragment_response("strategies")
 
 @app.route("/poll/logs")
 def poll_logs():
-    return render_template_string(HTML_LOGS_ROWS, sys_logs=log_buffer)
+    return fragment_response("logs")
 
 @app.route("/strategy/<id>")
 def strategy_detail(id):
-    if id not in strategies: return redirect("/")
-    keys = list(strategies.keys())
+    if id not in dashboard_view: return redirect("/")
+    keys = list(dashboard_view.keys())
     idx = keys.index(id)
     prev_id = keys[idx-1] if idx > 0 else None
     next_id = keys[idx+1] if idx < len(keys)-1 else None
 
-    content = render_template_string(HTML_DETAIL_WRAPPER, strat=strategies.get(id), prev_id=prev_id, next_id=next_id)
-    return render_template_string(HTML_BASE, content=content, global_limit=GLOBAL_CONFIG['api_fetch_limit'], debug_mode=GLOBAL_CONFIG.get('debug', False), last_update=datetime.now().strftime("%H:%M:%S"), navbar_stats=render_template_string(HTML_NAVBAR_STATS, global_limit=GLOBAL_CONFIG['api_fetch_limit'], last_update=datetime.now().strftime("%H:%M:%S")))
+    fragments = {name: render_fragment(name, id)[0] for name in ("stats", "active", "history", "logs")}
+    return render_page("detail", events_url=f"/events?strategy={id}", strat=dashboard_view.get(id), prev_id=prev_id, next_id=next_id, fragments=fragments)
 
 @app.route("/poll/strategy_stats/<id>")
 def poll_strategy_stats(id):
-    if id not in strategies: return ""
-    return render_template_string(HTML_DETAIL_STATS, strat=strategies[id])
+    if id not in dashboard_view: return ""
+    return fragment_response("stats", id)
 
 @app.route("/poll/strategy_active/<id>")
 def poll_strategy_active(id):
-    if id not in strategies: return ""
-    return render_template_string(HTML_DETAIL_ACTIVE_BETS, strat=strategies[id])
+    if id not in dashboard_view: return ""
+    return fragment_response("active", id)
 
 @app.route("/poll/strategy_history/<id>")
 def poll_strategy_history(id):
-    if id not in strategies: return ""
-    return render_template_string(HTML_DETAIL_HISTORY, strat=strategies[id])
+    if id not in dashboard_view: return ""
+    return fragment_response("history", id)
 
 @app.route("/poll/strategy_logs/<id>")
 def poll_strategy_logs(id):
-    if id not in strategies: return ""
-    return render_template_string(HTML_DETAIL_LOGS, strat=strategies[id])
+    if id not in dashboard_view: return ""
+    return fragment_response("logs", id)
+
+@app.before_request
+def profile_request():
+    # Langlebige Streams würden nur Leerlauf messen
+    if profiler.running and request.path not in ("/events", "/debug/profile"): profiler.enter("flask")
+
+@app.teardown_request
+def profile_request_done(exc=None):
+    profiler.leave()
+
+@app.route("/debug/profile")
+def debug_profile():
+    """Top-N Hotspots je Zyklus oder ?format=collapsed (Flamegraph), optional ?cycles=N"""
+    cycles = request.args.get("cycles", type=int)
+    if request.args.get("format") == "collapsed":
+        return Response(profiler.collapsed(cycles), mimetype="text/plain")
+    return Response(profiler.report(request.args.get("top", 15, type=int), cycles or 5), mimetype="text/plain")
+
+@app.route("/metrics")
+def metrics_route():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+SSE_MIN_INTERVAL = 1.0 # Sekunden: Änderungen innerhalb dieses Fensters werden zu einem Push zusammengefasst
+SSE_KEEPALIVE = 15
+
+def sse_event(name, html):
+    return f"event: {name}\n" + "".join(f"data: {line}\n" for line in html.split("\n")) + "\n"
+
+@app.route("/events")
+def events():
+    """SSE statt Polling: Fragmente werden nur gesendet, wenn der state_bus eine Änderung meldet"""
+    page, s_id = request.args.get("page"), request.args.get("strategy")
+    if s_id is not None and s_id not in dashboard_view: return Response(status=204) # Kein Reconnect
+
+    # Thema -> (SSE Event, Renderer)
+    topics = {"navbar": ("navbar", lambda: render_fragment("navbar")[0])}
+    if page == "home":
+        topics["strategies"] = ("strategies", lambda: render_fragment("strategies")[0])
+        topics["logs"] = ("logs", lambda: render_fragment("logs")[0])
+    if s_id is not None:
+        for name, event in (("stats", "stats"), ("active", "active"), ("history", "history"), ("logs", "strategy_logs")):
+            topics[f"{name}:{s_id}"] = (event, lambda name=name: render_fragment(name, s_id)[0])
+
+    def stream():
+        seen = {t: -1 for t in topics} # Beim Verbinden einmal alles senden
+        last_push = 0.0
+        while True:
+            if s_id is not None and s_id not in dashboard_view: return
+            wait = SSE_MIN_INTERVAL - (time.time() - last_push)
+            if wait > 0: time.sleep(wait)
+            changed = state_bus.wait(seen, SSE_KEEPALIVE)
+            if not changed:
+                yield ": ping\n\n"
+                continue
+            seen.update(changed)
+            last_push = time.time()
+            yield "".join(sse_event(topics[t][0], topics[t][1]()) for t in changed)
+
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route("/create_strategy", methods=["POST"])
 def create_strategy():
     s = Strategy(); s.name = request.form.get("name")
     try: s.balance = s.initial_balance = float(request.form.get("balance"))
     except: pass
-    strategies[s.id] = s; save_data(); return redirect("/")
+    global strategies
+    with strategies_lock: strategies = {**strategies, s.id: s}
+    save_data(); return redirect("/")
 
 @app.route("/update_strategy/<id>", methods=["POST"])
 def update_strategy(id):
-    if id in strategies:
-        s = strategies[id]
+    s = strategies.get(id)
+    if s:
         try:
-            s.name = request.form.get("name")
-            s.category_filter = request.form.get("category_filter").strip()
-            s.min_prob = float(request.form.get("min_prob"))
-            s.max_prob = float(request.form.get("max_prob"))
-            s.max_time_min = int(request.form.get("max_time_min"))
-            s.bet_percentage = float(request.form.get("bet_percentage"))
-            s.stop_loss_trigger = float(request.form.get("stop_loss_trigger"))
-            s.min_liquidity = float(request.form.get("min_liquidity"))
+            # Erst alles parsen, dann unter dem Lock übernehmen (Engine sieht nie eine halbe Konfiguration)
+            values = {
+                "name": request.form.get("name"),
+                "category_filter": request.form.get("category_filter").strip(),
+                "min_prob": float(request.form.get("min_prob")),
+                "max_prob": float(request.form.get("max_prob")),
+                "max_time_min": int(request.form.get("max_time_min")),
+                "bet_percentage": float(request.form.get("bet_percentage")),
+                "stop_loss_trigger": float(request.form.get("stop_loss_trigger")),
+                "min_liquidity": float(request.form.get("min_liquidity")),
+            }
+            with s._lock: s.__dict__.update(values)
             save_data()
         except: pass
     return redirect(f"/strategy/{id}#config")
@@ -784,9 +1462,9 @@ def update_strategy(id):
 @app.route("/action/duplicate/<id>")
 def duplicate_strategy(id):
     global strategies
-    if id in strategies:
-        source = strategies[id]
-        data = source.to_dict().copy()
+    source = strategies.get(id)
+    if source:
+        with source._lock: data = source.to_dict()
         new_id = str(uuid.uuid4())[:8]
         data["id"] = new_id
         if not data["name"].endswith(" (Kopie)"): data["name"] = data["name"] + " (Kopie)"
@@ -801,25 +1479,29 @@ def duplicate_strategy(id):
         data["initial_balance"] = initial
         new_strat = Strategy(data)
         new_strat.log(f"Kopie von '{source.name}' erstellt.")
-        new_strategies = {}
-        for key, val in strategies.items():
-            new_strategies[key] = val
-            if key == id: new_strategies[new_id] = new_strat
-        strategies = new_strategies
+        with strategies_lock:
+            new_strategies = {}
+            for key, val in strategies.items():
+                new_strategies[key] = val
+                if key == id: new_strategies[new_id] = new_strat
+            strategies = new_strategies
         save_data()
     return redirect("/")
 
 @app.route("/reorder_strategies", methods=["POST"])
 def reorder_strategies():
     global strategies; order = request.json.get('order', [])
-    new_map = {uid: strategies[uid] for uid in order if uid in strategies}
-    for uid, s in strategies.items():
-        if uid not in new_map: new_map[uid] = s
-    strategies = new_map; save_data(); return jsonify({"status":"ok"})
+    with strategies_lock:
+        new_map = {uid: strategies[uid] for uid in order if uid in strategies}
+        for uid, s in strategies.items():
+            if uid not in new_map: new_map[uid] = s
+        strategies = new_map
+    save_data(); return jsonify({"status":"ok"})
 
 @app.route("/check_update")
 def check_update_route():
     has_update, _ = check_for_updates_logic()
+    publish_dashboard() # Update-Symbol in der Navbar
     if has_update:
         return """
         <div class="text-center">
@@ -869,11 +1551,16 @@ def perform_update_route():
 
 @app.route("/action/<action>/<id>")
 def action(action, id):
-    if id in strategies:
-        if action == "start": strategies[id].is_running = True
-        elif action == "stop": strategies[id].is_running = False
-        elif action == "delete": del strategies[id]
-        elif action == "reset": strategies[id].reset_stats()
+    global strategies
+    s = strategies.get(id)
+    if s:
+        if action == "delete":
+            with strategies_lock: strategies = {k: v for k, v in strategies.items() if k != id}
+        else:
+            with s._lock:
+                if action == "start": s.is_running = True
+                elif action == "stop": s.is_running = False
+                elif action == "reset": s.reset_stats()
         save_data()
     return redirect("/")
 
@@ -882,17 +1569,23 @@ def global_action(action):
     if action == "toggle_debug":
         GLOBAL_CONFIG["debug"] = not GLOBAL_CONFIG.get("debug", False)
         sys_log(f"Debug Modus {'aktiviert' if GLOBAL_CONFIG['debug'] else 'deaktiviert'}.")
+        if not GLOBAL_CONFIG["debug"]: profiler.stop()
+        return redirect(request.referrer or "/")
+    if action == "toggle_profiler":
+        # Nur im Debug-Modus zuschaltbar
+        if profiler.running: profiler.stop()
+        elif GLOBAL_CONFIG.get("debug"): profiler.start()
         return redirect(request.referrer or "/")
     for s in list(strategies.values()):
-        if action == "start_all": s.is_running = True
-        elif action == "stop_all": s.is_running = False
-        elif action == "reset_all": s.reset_stats()
+        with s._lock:
+            if action == "start_all": s.is_running = True
+            elif action == "stop_all": s.is_running = False
+            elif action == "reset_all": s.reset_stats()
     save_data(); return redirect("/")
 
 @app.route("/mass_edit")
 def mass_edit():
-    content = render_template_string(HTML_MASS_EDIT, strategies=strategies)
-    return render_template_string(HTML_BASE, content=content, global_limit=GLOBAL_CONFIG['api_fetch_limit'], debug_mode=GLOBAL_CONFIG.get('debug', False), last_update=datetime.now().strftime("%H:%M:%S"), navbar_stats=render_template_string(HTML_NAVBAR_STATS, global_limit=GLOBAL_CONFIG['api_fetch_limit'], last_update=datetime.now().strftime("%H:%M:%S")))
+    return render_page("mass_edit", strategies=dashboard_view)
 
 @app.route("/mass_edit_apply", methods=["POST"])
 def mass_edit_apply():
@@ -902,17 +1595,18 @@ def mass_edit_apply():
     if not ids: return redirect("/mass_edit")
     count = 0
     for id in ids:
-        if id in strategies:
-            s = strategies[id]
+        s = strategies.get(id)
+        if s:
             try:
-                if field in ["min_prob", "max_prob", "bet_percentage", "stop_loss_trigger", "min_liquidity"]:
-                    val = float(value.replace(",", "."))
-                    setattr(s, field, val)
-                elif field == "max_time_min":
-                    val = int(value)
-                    setattr(s, field, val)
-                elif field == "category_filter":
-                    setattr(s, field, str(value).strip())
+                with s._lock:
+                    if field in ["min_prob", "max_prob", "bet_percentage", "stop_loss_trigger", "min_liquidity"]:
+                        val = float(value.replace(",", "."))
+                        setattr(s, field, val)
+                    elif field == "max_time_min":
+                        val = int(value)
+                        setattr(s, field, val)
+                    elif field == "category_filter":
+                        setattr(s, field, str(value).strip())
                 count += 1
             except: pass
     if count > 0:
@@ -922,15 +1616,9 @@ def mass_edit_apply():
 
 @app.route("/settings")
 def settings_page():
-    content = render_template_string(HTML_SETTINGS,
-                                     global_config=GLOBAL_CONFIG,
-                                     default_strategy=DEFAULT_STRATEGY_CONFIG)
-    return render_template_string(HTML_BASE,
-                                  content=content,
-                                  global_limit=GLOBAL_CONFIG['api_fetch_limit'],
-                                  debug_mode=GLOBAL_CONFIG.get('debug', False),
-                                  last_update=datetime.now().strftime("%H:%M:%S"),
-                                  navbar_stats=render_template_string(HTML_NAVBAR_STATS, global_limit=GLOBAL_CONFIG['api_fetch_limit'], last_update=datetime.now().strftime("%H:%M:%S")))
+    return render_page("settings",
+                       global_config=GLOBAL_CONFIG,
+                       default_strategy=DEFAULT_STRATEGY_CONFIG)
 
 @app.route("/settings/save", methods=["POST"])
 def settings_save():
@@ -956,6 +1644,7 @@ def settings_save():
         sys_log(f"Fehler beim Speichern der Standardwerte: {e}")
 
     save_config()
+    publish_dashboard()
     sys_log("Einstellungen aktualisiert.")
     return redirect("/settings")
 
@@ -968,290 +1657,2563 @@ def action_restart_server():
     sys_log("Restart angefordert...")
     return redirect("/")
 
-# --- OPTIMIERTE ENGINE ---
-class Engine:
+# --- MARKT-CACHE ---
+_MISSING = object()
+
+class MarketCache:
+    """Geparste Marktfelder über Scans hinweg; neu geparst wird nur, was sich geändert hat"""
     def __init__(self):
-        # OPTIMIERUNG 1: Session für Connection Reuse
-        self.session = requests.Session()
-        self.session.headers.update({"User-Agent": "Mozilla/5.0"})
+        self.entries = {}
+        self.stats = {"parsed": 0, "reused": 0, "evicted": 0}
+
+    def process(self, raw_markets, now):
+        """Liefert die vorverarbeiteten Märkte des Scans (gleiches Format wie bisher)"""
+        self.begin()
+        rows = self.add(raw_markets, now)
+        self.end()
+        return rows
+
+    def begin(self):
+        """Neuer Scan: Seiten folgen per add(), end() verwirft nicht mehr gesehene Märkte"""
+        self.seen, self.counts = {}, [0, 0]
+
+    def add(self, raw_markets, now):
+        rows, seen = [], self.seen
+        parsed = reused = 0
+        for m in raw_markets:
+            mid = m.get("id")
+            pm = self.entries.get(mid) or seen.get(mid)
+            if pm is None: pm = {"src": {}}
+            try:
+                # Gleiches Payload-Objekt wie im letzten Scan (z.B. Replay) -> nichts zu prüfen
+                changed = 0 if pm.get("raw") is m else self._refresh(pm, m)
+                seconds_left = int((pm["end"] - now).total_seconds())
+            except: continue
+            pm["raw"] = m # Referenz aufs Original für ID, Title etc.
+            pm["seconds_left"] = seconds_left
+            pm["minutes_left"] = seconds_left // 60
+            rows.append(pm)
+            if changed: parsed += changed
+            else: reused += 1
+            # Geschlossene Märkte nicht weiter vorhalten
+            if m.get("closed") is not True: seen[mid] = pm
+        self.counts[0] += parsed
+        self.counts[1] += reused
+        return rows
+
+    def end(self):
+        # Alles, was nicht mehr im Scan auftaucht, fliegt raus
+        self.stats = {"parsed": self.counts[0], "reused": self.counts[1], "evicted": len(self.entries.keys() - self.seen.keys())}
+        self.entries = self.seen
+
+    def _refresh(self, pm, m):
+        """Leitet nur die Felder neu ab, deren Rohwert sich geändert hat; gibt die Anzahl zurück"""
+        src, changed = pm["src"], 0
+
+        outcomes_raw, prices_raw = m.get("outcomes", "[]"), m.get("outcomePrices", "[]")
+        if src.get("outcomes", _MISSING) != outcomes_raw or src.get("prices", _MISSING) != prices_raw:
+            src.pop("outcomes", None) # Bei Parse-Fehler nicht als aktuell markieren
+            outcomes = json.loads(outcomes_raw)
+            prices = [float(p) for p in json.loads(prices_raw)]
+
+            best_price, best_outcome = 0, None
+            for i, p in enumerate(prices):
+                if p > best_price: best_price, best_outcome = p, outcomes[i]
+            pm["best_price"], pm["best_outcome"] = best_price, best_outcome
+            src["outcomes"], src["prices"] = outcomes_raw, prices_raw
+            changed += 1
+
+        end_raw = m["endDate"]
+        if src.get("end", _MISSING) != end_raw:
+            src.pop("end", None)
+            pm["end"] = datetime.fromisoformat(end_raw.replace('Z', '+00:00'))
+            src["end"] = end_raw
+            changed += 1
+
+        tags_raw = m.get("tags", [])
+        if src.get("tags", _MISSING) != tags_raw:
+            pm["tags"] = str(tags_raw).lower()
+            src["tags"] = tags_raw
+            changed += 1
+
+        spread_raw, liq_raw = m.get("spread", 0), m.get("liquidity", 0)
+        if src.get("spread", _MISSING) != spread_raw or src.get("liquidity", _MISSING) != liq_raw:
+            src.pop("spread", None)
+            pm["spread"], pm["liquidity"] = float(spread_raw), float(liq_raw)
+            src["spread"], src["liquidity"] = spread_raw, liq_raw
+            changed += 1
+        return changed
+
+# --- MARKT-MATRIX ---
+class MarketMatrix:
+    """Spaltenweise Sicht auf die vorverarbeiteten Märkte eines Scans inkl. Schwellwert-Index"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.tag_masks = {} # Kategorie-Filter -> Treffer-Spalte (1x pro Scan berechnet)
+        if np is not None:
+            n = len(rows)
+            self.spread = np.fromiter((pm["spread"] for pm in rows), dtype=np.float64, count=n)
+            self.liquidity = np.fromiter((pm["liquidity"] for pm in rows), dtype=np.float64, count=n)
+            self.minutes_left = np.fromiter((pm["minutes_left"] for pm in rows), dtype=np.int64, count=n)
+            self.best_price = np.fromiter((pm["best_price"] for pm in rows), dtype=np.float64, count=n)
+
+            # Index: Zeilen sortiert nach Restlaufzeit und nach bestem Preis (für Binärsuche)
+            self.time_order = np.argsort(self.minutes_left, kind="stable")
+            self.time_sorted = self.minutes_left[self.time_order]
+            self.price_order = np.argsort(self.best_price, kind="stable")
+            self.price_sorted = self.best_price[self.price_order]
+        else:
+            self.time_order = sorted(range(len(rows)), key=lambda i: rows[i]["minutes_left"])
+            self.time_sorted = [rows[i]["minutes_left"] for i in self.time_order]
+            # NaN-Preise fallen nie ins Preisband und bleiben daher aus dem Preis-Index draußen
+            priced = [i for i, pm in enumerate(rows) if pm["best_price"] == pm["best_price"]]
+            self.price_order = sorted(priced, key=lambda i: rows[i]["best_price"])
+            self.price_sorted = [rows[i]["best_price"] for i in self.price_order]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def tag_mask(self, category):
+        cat = category.lower()
+        if cat not in self.tag_masks:
+            hits = [cat in pm["tags"] for pm in self.rows]
+            self.tag_masks[cat] = np.array(hits, dtype=bool) if np is not None else hits
+        return self.tag_masks[cat]
+
+    def candidates(self, strat):
+        """Zeilen-Indizes (in Scan-Reihenfolge), die alle Filter der Strategie bestehen"""
+        if np is None:
+            return self._candidates_py(strat)
+
+        # Zeitfenster (0, max_time_min] und Preisband [min_prob, max_prob] per Binärsuche,
+        # danach nur den kleineren der beiden Ausschnitte weiter prüfen
+        t_lo = np.searchsorted(self.time_sorted, 0, side="right")
+        t_hi = np.searchsorted(self.time_sorted, strat.max_time_min, side="right")
+        p_lo = np.searchsorted(self.price_sorted, strat.min_prob, side="left")
+        p_hi = np.searchsorted(self.price_sorted, strat.max_prob, side="right")
+        if t_hi <= t_lo or p_hi <= p_lo:
+            return []
+        if t_hi - t_lo <= p_hi - p_lo:
+            idx = self.time_order[t_lo:t_hi]
+            bp = self.best_price[idx]
+            mask = (bp >= strat.min_prob) & (bp <= strat.max_prob)
+        else:
+            idx = self.price_order[p_lo:p_hi]
+            ml = self.minutes_left[idx]
+            mask = (ml > 0) & (ml <= strat.max_time_min)
+
+        # Negierte Vergleiche, damit NaN-Werte exakt wie in der Schleife behandelt werden
+        mask &= ~(self.spread[idx] > strat.max_spread)
+        mask &= ~(self.liquidity[idx] < strat.min_liquidity)
+        if strat.category_filter:
+            mask &= self.tag_mask(strat.category_filter)[idx]
+        # Zurück in Scan-Reihenfolge, damit Budget-Abbruch & Kaufreihenfolge gleich bleiben
+        return np.sort(idx[mask]).tolist()
+
+    def _candidates_py(self, strat):
+        t_lo = bisect.bisect_right(self.time_sorted, 0)
+        t_hi = bisect.bisect_right(self.time_sorted, strat.max_time_min)
+        p_lo = bisect.bisect_left(self.price_sorted, strat.min_prob)
+        p_hi = bisect.bisect_right(self.price_sorted, strat.max_prob)
+        if t_hi <= t_lo or p_hi <= p_lo:
+            return []
+        idx = self.time_order[t_lo:t_hi] if t_hi - t_lo <= p_hi - p_lo else self.price_order[p_lo:p_hi]
+
+        tags = self.tag_mask(strat.category_filter) if strat.category_filter else None
+        out = []
+        for i in idx:
+            pm = self.rows[i]
+            if tags is not None and not tags[i]: continue
+            if pm["spread"] > strat.max_spread: continue
+            if pm["liquidity"] < strat.min_liquidity: continue
+            if pm["minutes_left"] <= 0 or pm["minutes_left"] > strat.max_time_min: continue
+            if strat.min_prob <= pm["best_price"] <= strat.max_prob: out.append(i)
+        out.sort()
+        return out
+
+# --- POSITIONS-LEDGER ---
+class LedgerEntry:
+    """Gemeinsamer Marktzustand für alle Positionen auf denselben Markt"""
+    def __init__(self, market_id):
+        self.market_id = market_id
+        self.prices = None # Outcome -> aktueller Preis
+        self.end = None
+        self.closed = None
+        self.fail_count = 0
+        self.tokens = {} # CLOB Token-ID -> Outcome (für den Preis-Feed)
+        self.positions = [] # (s_id, bet) aller Strategien mit Position auf diesem Markt
+
+    def apply_fetch(self, m):
+        """Ergebnis eines Abrufs: Markt übernehmen oder (None) Fehlerzähler erhöhen"""
+        if m is None:
+            self.fail_count += 1
+        else:
+            self.fail_count = 0
+            self.update(m)
 
-    def fetch_markets(self):
-        all_markets = []
-        limit = GLOBAL_CONFIG["api_fetch_limit"]
-        batch = 500
-        offsets = range(0, limit, batch)
-        url = "https://gamma-api.polymarket.com/markets"
-        now = datetime.now(timezone.utc).isoformat()
+    def update(self, m):
+        # Erst komplett bauen, dann je Feld einmal zuweisen: der Preis-Feed liest parallel
+        prices, end, tokens = None, None, self.tokens
+        try:
+            outcomes = json.loads(m.get("outcomes", "[]"))
+            prices = dict(zip(outcomes, [float(p) for p in json.loads(m.get("outcomePrices", "[]"))]))
+            end = datetime.fromisoformat(m["endDate"].replace('Z', '+00:00'))
+            tokens = dict(zip(json.loads(m.get("clobTokenIds") or "[]"), outcomes))
+        except: pass
+        self.closed, self.prices, self.end, self.tokens = m.get("closed"), prices, end, tokens
 
-        def load_batch(o):
-            try:
-                # Nutzt die Session
-                r = self.session.get(url, params={
-                    "active": "true", "closed": "false", "order": "endDate",
-                    "ascending": "true", "end_date_min": now,
-                    "limit": str(batch), "offset": str(o)
-                }, timeout=10)
-                if r.status_code == 200: return r.json()
+class PositionLedger:
+    """Zentrale, nach market_id indizierte Sicht auf alle offenen Positionen"""
+    def __init__(self):
+        self.entries = {}
 
-                if GLOBAL_CONFIG.get("debug"):
-                    sys_log(f"DEBUG Batch-Fehler (Offset {o}): Status {r.status_code} - {r.reason}")
+    def rebuild(self, strategy_map):
+        # Neue Positionslisten bauen und erst am Ende austauschen: Preis-Feed & Monitor lesen parallel
+        entries, positions, fresh = {}, {}, set()
+        for s_id, strat in list(strategy_map.items()):
+            for bet in strat.active_bets:
+                mid = str(bet["market_id"])
+                entry = entries.get(mid)
+                if entry is None:
+                    entry = self.entries.get(mid)
+                    if entry is None:
+                        entry = LedgerEntry(mid)
+                        fresh.add(mid)
+                    entries[mid], positions[mid] = entry, []
+                if mid in fresh:
+                    # Neuer Eintrag (z.B. nach Neustart): Fehlerzähler aus den gespeicherten Wetten übernehmen
+                    entry.fail_count = max(entry.fail_count, bet.get("fail_count", 0))
+                positions[mid].append((s_id, bet))
+        for mid, entry in entries.items(): entry.positions = positions[mid]
+        # Märkte ohne offene Positionen fallen raus
+        self.entries = entries
+        return entries
+
+# --- SNAPSHOT RECORDER ---
+# Datensatz: Kopf (Magic, Zeitstempel, Art, Zeilen, Länge) + zlib-komprimierte Spalten (JSON je Feld)
+SNAPSHOT_HEADER = struct.Struct("<4sdBII")
+SNAPSHOT_MAGIC = b"PBR1"
+SNAPSHOT_KINDS = {"scan": 0, "bets": 1}
+SNAPSHOT_COLUMNS = ("id", "question", "slug", "outcomes", "outcomePrices", "endDate", "tags",
+                    "spread", "liquidity", "closed", "clobTokenIds")
+
+def encode_snapshot(markets):
+    """Zeilen -> spaltenweise JSON-Listen, zlib-komprimiert"""
+    cols = {c: [m.get(c) for m in markets] for c in SNAPSHOT_COLUMNS}
+    return zlib.compress(json.dumps(cols, separators=(",", ":")).encode(), 6)
+
+def decode_snapshot(payload):
+    cols = json.loads(zlib.decompress(payload))
+    names = list(cols)
+    # Fehlende Felder (None) weglassen, damit m.get(..., default) wie beim Live-Payload greift
+    return [{k: v for k, v in zip(names, vals) if v is not None} for vals in zip(*cols.values())]
+
+def write_snapshot(f, ts, kind, markets):
+    payload = encode_snapshot(markets)
+    f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, ts, kind, len(markets), len(payload)))
+    f.write(payload)
+
+def write_snapshots(directory, snapshots):
+    """Schreibt (ts, Art, Märkte) synchron im Recorder-Format (z.B. synthetische Daten für den Sweep)"""
+    os.makedirs(directory, exist_ok=True)
+    paths, files = SnapshotRecorder(directory), {}
+    try:
+        for ts, kind, markets in snapshots:
+            path = paths.path_for(ts)
+            if path not in files: files[path] = open(path, "ab")
+            write_snapshot(files[path], ts, SNAPSHOT_KINDS[kind], markets)
+    finally:
+        for f in files.values(): f.close()
+
+def markets_until(markets, end):
+    """Anfang eines nach endDate sortierten Scans bis einschließlich end (Binärsuche)"""
+    cut = end.strftime("%Y-%m-%dT%H:%M:%SZ")
+    lo, hi = 0, len(markets)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if markets[mid].get("endDate", "") <= cut: lo = mid + 1
+        else: hi = mid
+    return markets[:lo]
+
+class SnapshotRecorder:
+    """Schreibt Scans & Wetten-Updates append-only auf Disk (eigener Thread, begrenzte Queue)"""
+    def __init__(self, directory, max_queue=64):
+        self.directory = directory
+        self.enabled = None # None = GLOBAL_CONFIG["record_snapshots"] folgen
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = None
+        self.dropped = 0
+        self.written = 0
+
+    def record(self, kind, markets, ts=None):
+        """Nimmt einen Snapshot an, ohne je den Scan-Loop zu blockieren (volle Queue = verwerfen)"""
+        enabled = self.enabled if self.enabled is not None else GLOBAL_CONFIG.get("record_snapshots")
+        if not enabled or markets is None: return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.writer, daemon=True)
+            self.thread.start()
+        try:
+            self.queue.put_nowait((ts if ts is not None else time.time(), SNAPSHOT_KINDS[kind], markets))
+        except queue.Full:
+            self.dropped += 1
+            if GLOBAL_CONFIG.get("debug"):
+                sys_log(f"DEBUG Recorder: Queue voll, Snapshot verworfen ({self.dropped} insgesamt).")
+
+    def path_for(self, ts):
+        day = datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%d")
+        return os.path.join(self.directory, f"markets-{day}.pbr")
+
+    def writer(self):
+        os.makedirs(self.directory, exist_ok=True)
+        f, current = None, None
+        while True:
+            ts, kind, markets = self.queue.get()
+            try:
+                path = self.path_for(ts)
+                if path != current: # Tageswechsel -> neue Datei
+                    if f: f.close()
+                    f, current = open(path, "ab"), path
+                write_snapshot(f, ts, kind, markets)
+                if self.queue.empty(): f.flush()
+                self.written += 1
             except Exception as e:
-                if GLOBAL_CONFIG.get("debug"):
-                    sys_log(f"DEBUG Batch-Exception (Offset {o}): {e}")
+                sys_log(f"Recorder Fehler: {e}")
+
+class SnapshotReader:
+    """Liest aufgezeichnete Snapshots per Memory-Mapping, gefiltert nach Zeitraum"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.index = {} # Pfad -> (gelesene Bytes, [(ts, kind, rows, offset, length)])
+
+    def files(self, start=None, end=None):
+        if not os.path.isdir(self.directory): return []
+        out = []
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith("markets-") and name.endswith(".pbr")): continue
+            day = datetime.strptime(name[8:16], "%Y%m%d").replace(tzinfo=timezone.utc).timestamp()
+            if start is not None and day + 86400 <= start: continue
+            if end is not None and day > end: continue
+            out.append(os.path.join(self.directory, name))
+        return out
+
+    def scan_index(self, path, mm):
+        """Liest nur die Köpfe (ohne Dekomprimieren); bei gewachsener Datei inkrementell weiter"""
+        pos, entries = self.index.get(path, (0, []))
+        size = len(mm)
+        while pos + SNAPSHOT_HEADER.size <= size:
+            magic, ts, kind, rows, length = SNAPSHOT_HEADER.unpack_from(mm, pos)
+            if magic != SNAPSHOT_MAGIC or pos + SNAPSHOT_HEADER.size + length > size: break # unvollständiger Datensatz
+            entries.append((ts, kind, rows, pos + SNAPSHOT_HEADER.size, length))
+            pos += SNAPSHOT_HEADER.size + length
+        self.index[path] = (pos, entries)
+        return entries
+
+    def snapshots(self, start=None, end=None, kinds=("scan", "bets")):
+        """Liefert (Zeitstempel, Art, Märkte) aller Snapshots mit start <= ts <= end, zeitlich sortiert"""
+        wanted = {SNAPSHOT_KINDS[k] for k in kinds}
+        names = {v: k for k, v in SNAPSHOT_KINDS.items()}
+        for path in self.files(start, end):
+            if os.path.getsize(path) == 0: continue
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for ts, kind, rows, offset, length in self.scan_index(path, mm):
+                    if kind not in wanted: continue
+                    if start is not None and ts < start: continue
+                    if end is not None and ts > end: break
+                    yield ts, names[kind], decode_snapshot(mm[offset:offset + length])
+
+# --- FETCH-PLANUNG ---
+def gamma_url(path=""):
+    """Endpunkt unter der konfigurierten Gamma-Basis-URL"""
+    return GLOBAL_CONFIG.get("api_base_url", "https://gamma-api.polymarket.com").rstrip("/") + path
+
+class FetchPlan:
+    """Plant die Seiten eines Scans: stoppt, sobald die Ergebnisse den Horizont der Strategien überschreiten"""
+    def __init__(self, now, limit, batch, horizon_min=None, max_wave=20):
+        self.now_iso = now.isoformat()
+        self.batch = batch
+        self.offsets = list(range(0, limit, batch))
+        self.horizon_end = now + timedelta(minutes=horizon_min) if horizon_min is not None else None
+        self.max_wave = max_wave
+        self.wave = 1
+        self.done = not self.offsets
+        self.limit = limit
+        self.stop_reason = None
+
+        # Scan-Bericht
+        self.pages = 0
+        self.duplicates = 0
+        self.gaps = 0 # Fehlgeschlagene Seiten -> Daten fehlen in diesem Scan
+        self.seen = set()
+
+        # Keyset-Cursor: end_date_min + Offset innerhalb gleicher endDates
+        self.cursor = self.now_iso
+        self.tie_offset = 0
+
+    def params(self, offset):
+        p = {
+            "active": "true", "closed": "false", "order": "endDate",
+            "ascending": "true", "end_date_min": self.now_iso,
+            "limit": str(self.batch), "offset": str(offset)
+        }
+        if self.horizon_end is not None: p["end_date_max"] = self.horizon_end.isoformat()
+        return p
+
+    def next_wave(self):
+        """Nächste Offsets: ohne Horizont alle auf einmal, sonst in wachsenden Wellen (1, 2, 4, ...)"""
+        if self.done: return []
+        size = len(self.offsets) if self.horizon_end is None else self.wave
+        wave, self.offsets = self.offsets[:size], self.offsets[size:]
+        self.wave = min(self.wave * 2, self.max_wave)
+        if not self.offsets: self.done = True
+        return wave
+
+    def dedupe(self, rows):
+        """Entfernt Märkte, die dieser Scan schon geliefert hat"""
+        fresh = []
+        for m in rows:
+            mid = m.get("id")
+            if mid in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(mid)
+            fresh.append(m)
+        return fresh
+
+    def keyset_params(self):
+        p = self.params(self.tie_offset)
+        p["end_date_min"] = self.cursor
+        return p
+
+    def passed_horizon(self, rows):
+        if self.horizon_end is None or not rows: return False
+        try:
+            return datetime.fromisoformat(rows[-1]["endDate"].replace('Z', '+00:00')) > self.horizon_end
+        except: return False
+
+    def feed_keyset(self, rows):
+        """Wertet eine Keyset-Seite aus, rückt den Cursor vor und liefert nur neue Märkte"""
+        if rows is None:
+            # Ohne Antwort kann der Cursor nicht weiter -> Lücke, Scan endet hier
+            self.gaps += 1
+            self.done, self.stop_reason = True, "Seitenfehler"
             return []
+        self.pages += 1
+        fresh = self.dedupe(rows)
+        if len(rows) < self.batch:
+            self.done, self.stop_reason = True, "letzte Seite"
+        elif self.pages >= 2 * (self.limit // self.batch) + 10:
+            # Schutz gegen eine API, die den Cursor ignoriert
+            self.done, self.stop_reason = True, "Seitenlimit"
+        elif self.passed_horizon(rows):
+            self.done, self.stop_reason = True, "Horizont erreicht"
+        elif len(self.seen) >= self.limit:
+            self.done = True
+        elif rows[-1].get("endDate") == self.cursor:
+            # Ganze Seite mit gleichem endDate -> innerhalb des Zeitstempels weiterblättern
+            self.tie_offset += self.batch
+        else:
+            self.cursor, self.tie_offset = rows[-1].get("endDate"), 0
+        return fresh
+
+    def feed(self, rows):
+        """Wertet eine geladene Seite aus (None = Fehler, zählt nicht als Ende)"""
+        if rows is None:
+            self.gaps += 1
+            return
+        self.pages += 1
+        if self.horizon_end is None or self.done: return
+        if len(rows) < self.batch:
+            self.done, self.stop_reason = True, "letzte Seite"
+        elif self.passed_horizon(rows):
+            self.done, self.stop_reason = True, "Horizont erreicht"
+
+# --- OPTIMIERTE ENGINE ---
+class BuyPass:
+    """Kaufdurchlauf einer Strategie über einen Scan; die Seiten können nacheinander eingespeist werden"""
+    def __init__(self, strat):
+        self.strat = strat
+        # Budget Check: Einsatz 1x pro Zyklus aus der Equity zu Beginn
+        self.bet_amount = strat.get_equity() * strat.bet_percentage if strat.is_running else 0.0
+        self.done = self.bet_amount < 1.0
+        self.bought = False
+        self.pages = 0 # Anzahl bereits bewerteter Seiten (Pipeline)
+
+        # IDs der aktiven Wetten cachen für schnellen Lookup
+        self.active_ids = {b['market_id'] for b in strat.active_bets}
+
+    def feed(self, matrix, processed_markets):
+        if self.done: return
+        strat, bet_amount, active_ids = self.strat, self.bet_amount, self.active_ids
+
+        # Nur Zeilen, die alle Filter bestanden haben, laufen durch die Kauflogik
+        for i in matrix.candidates(strat):
+            pm = processed_markets[i]
+            m = pm["raw"]
+            if m['id'] in active_ids: continue
+
+            # Check funds (gilt für den Rest des Scans, auch über Seitengrenzen)
+            if strat.balance < bet_amount:
+                self.done = True
+                break
+
+            # KAUF SIGNAL
+            strat.balance -= bet_amount
+
+            # DETAILED LOG
+            strat.log(f"🚀 KAUF: {m['question']} | ${bet_amount:.2f} auf {pm['best_outcome']} @ {pm['best_price']:.2f}")
+
+            if pm["seconds_left"] > 3600: t_str = f"{pm['seconds_left'] // 3600}h {(pm['seconds_left'] % 3600) // 60}m"
+            else: t_str = f"{pm['seconds_left'] // 60}m {pm['seconds_left'] % 60}s"
+
+            strat.active_bets.append({
+                "market_id": m["id"],
+                "slug": m.get("slug",""),
+                "title": m["question"],
+                "picked_outcome": pm["best_outcome"],
+                "entry_price": pm["best_price"],
+                "current_price": pm["best_price"],
+                "amount": bet_amount,
+                "time_str": t_str,
+                "minutes_left": pm["minutes_left"],
+                "fail_count": 0
+            })
+            active_ids.add(m['id']) # Verhindert doppelkauf im gleichen Loop
+            self.bought = True
+
+class ScanPipeline:
+    """Parst und bewertet jede Scan-Seite sofort beim Eintreffen statt nach dem kompletten Scan.
+    Ergebnis wie im Batch-Durchlauf: Seiten in Ankunftsreihenfolge, Budget 1x pro Strategie und Zyklus,
+    Strategien mit offenen Wetten warten, bis alle ihre Märkte aktualisiert sind."""
+    def __init__(self, engine, from_scan, track_bets=True):
+        self.engine = engine
+        self.from_scan = from_scan # Wetten-Märkte kommen aus den Seiten (bet_refresh_mode "scan")
+        self.start = time.time()
+        # Ohne track_bets (Monitor-Takt aktiv) bleiben die offenen Wetten dem Monitor überlassen
+        self.entries = engine.ledger.rebuild(engine.strategies) if track_bets else {}
+        self.fetched = {} # market_id -> (Markt oder None, Fehlergrund)
+        self.positions = {} # s_id -> [(market_id, bet)] in Ledger-Reihenfolge
+        for mid, entry in self.entries.items():
+            for s_id, bet in entry.positions: self.positions.setdefault(s_id, []).append((mid, bet))
+        self.waiting = {s_id: {mid for mid, _ in pos} for s_id, pos in self.positions.items()} # s_id -> fehlende Märkte
+        self.pages = [] # (Matrix, vorverarbeitete Märkte) je Seite
+        self.passes = {}
+        self.save_needed = False
+        self.first_decision = None
+        self.timings = {"preprocess": 0.0, "evaluate": 0.0}
+        engine.market_cache.begin()
+
+    def feed(self, page):
+        """Eine (deduplizierte) Seite des Scans"""
+        if not page: return
+        t0 = time.perf_counter()
+        rows = self.engine.market_cache.add(page, self.engine.clock())
+        self.pages.append((MarketMatrix(rows), rows))
+        self.timings["preprocess"] += time.perf_counter() - t0
+        if self.from_scan:
+            hits = {}
+            for m in page:
+                mid = str(m.get("id"))
+                if mid in self.entries and mid not in self.fetched: hits[mid] = (m, "MARKT DEFEKT/GELÖSCHT")
+            if hits: self.known(hits)
+        self.evaluate()
+
+    def missing(self):
+        return [mid for mid in self.entries if mid not in self.fetched]
+
+    def known(self, fetched):
+        """Abgerufene Wetten-Märkte übernehmen; Strategien, deren Märkte komplett sind, abrechnen"""
+        now = self.engine.clock()
+        for mid, (m, reason) in fetched.items():
+            self.fetched[mid] = (m, reason)
+            self.entries[mid].apply_fetch(m)
+        for s_id in list(self.waiting):
+            self.waiting[s_id] -= fetched.keys()
+            if self.waiting[s_id]: continue
+            del self.waiting[s_id]
+            strat = self.engine.strategies.get(s_id)
+            if strat is None: continue
+            work = [(bet, self.entries[mid], *self.fetched[mid]) for mid, bet in self.positions[s_id]]
+            if self.engine.apply_bet_updates(s_id, strat, work, now): self.save_needed = True
+
+    def settle(self, fetched):
+        """Restliche Wetten-Märkte (nachgeladen oder per Einzel-GET); danach wartet keine Strategie mehr"""
+        self.known({mid: fetched.get(mid, (None, "MARKT DEFEKT/GELÖSCHT")) for mid in self.missing()})
+        if self.entries: self.engine.recorder.record("bets", [m for m, _ in self.fetched.values() if m is not None])
+        self.evaluate()
+
+    def evaluate(self):
+        """Freie Strategien über alle noch nicht bewerteten Seiten laufen lassen"""
+        if not self.pages: return
+        t0 = time.perf_counter()
+        for s_id, strat in list(self.engine.strategies.items()):
+            if s_id in self.waiting: continue
+            with strat._lock:
+                buy = self.passes.get(s_id)
+                if buy is None: buy = self.passes[s_id] = BuyPass(strat)
+                for matrix, rows in self.pages[buy.pages:]: buy.feed(matrix, rows)
+                buy.pages = len(self.pages)
+        if self.first_decision is None: self.first_decision = time.time() - self.start
+        self.timings["evaluate"] += time.perf_counter() - t0
+
+    def finish(self):
+        cache = self.engine.market_cache
+        cache.end()
+        for phase, seconds in self.timings.items(): metrics.observe("polybot_phase_seconds", seconds, phase=phase)
+        if self.first_decision is not None: metrics.observe("polybot_phase_seconds", self.first_decision, phase="first_decision")
+        if GLOBAL_CONFIG.get("debug"):
+            st = cache.stats
+            sys_log(f"DEBUG Markt-Cache: {st['parsed']} Felder neu geparst, {st['reused']} Märkte unverändert, {st['evicted']} verworfen.")
+        if self.save_needed or any(b.bought for b in self.passes.values()): self.engine.persist()
+
+class FixedRate:
+    """Fester Takt ohne Drift: Soll-Starts liegen auf einem Raster; nach einem Überlauf startet der nächste Lauf sofort"""
+    def __init__(self, loop, interval):
+        self.loop = loop
+        self.interval = interval # Callable, damit geänderte Konfiguration sofort greift
+        self.due = time.monotonic()
+
+    def begin(self):
+        metrics.set("polybot_schedule_lag_seconds", round(max(0.0, time.monotonic() - self.due), 4), loop=self.loop)
+
+    def delay(self):
+        """Sekunden bis zum nächsten Soll-Start"""
+        self.due += self.interval()
+        now = time.monotonic()
+        if now > self.due:
+            # Verpasste Takte nicht nachholen, Raster ab jetzt neu
+            metrics.inc("polybot_schedule_overruns_total", loop=self.loop)
+            if GLOBAL_CONFIG.get("debug"):
+                sys_log(f"DEBUG Takt '{self.loop}' überschritten um {now - self.due:.2f}s.")
+            self.due = now
+        return self.due - now
+
+def parse_retry_after(value):
+    """Retry-After in Sekunden (Zahl oder HTTP-Datum); None wenn fehlend/unlesbar"""
+    if not value: return None
+    try: return max(0.0, float(value))
+    except ValueError: pass
+    try: return max(0.0, (email.utils.parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError): return None
+
+def retryable(status):
+    return status == "error" or status == 429 or (isinstance(status, int) and status >= 500)
+
+def retry_backoff(attempt):
+    return min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+# Bis hierhin (monotonic) werden fehlgeschlagene Requests wiederholt; je Loop gesetzt (Scan-Zyklus bzw. Monitor-Takt),
+# Tasks erben den Wert automatisch, Pool-Threads über submit_in_context
+request_deadline = contextvars.ContextVar("request_deadline", default=0.0)
+
+def submit_in_context(ex, fn, *args):
+    """ex.submit mit dem Kontext des Aufrufers, damit Pool-Threads die Retry-Deadline ihres Loops sehen"""
+    return ex.submit(contextvars.copy_context().run, fn, *args)
+
+class RequestGovernor:
+    """Gemeinsame Drossel für alle Gamma-Requests einer Engine: Token-Bucket für die Rate,
+    AIMD-Limit für parallele Requests (langsam hoch bei Erfolg, halbieren bei 429/5xx/Timeouts/Latenzspitzen), Pause bei Retry-After"""
+    def __init__(self, rate, max_limit, min_limit=2):
+        self.rate = rate
+        self.burst = max(1.0, float(rate))
+        self.tokens, self.stamp = self.burst, time.monotonic()
+        self.max_limit, self.min_limit = max_limit, min(min_limit, max_limit)
+        self.limit = float(max_limit) # Start wie bisher mit voller Parallelität, Drosselung erst bei Stau
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.base = None # EWMA der Latenz erfolgreicher Requests
+        self.last_cut = 0.0
+        self.cond = threading.Condition()
+
+    def try_acquire(self, now):
+        """Unter self.cond: (True, 0) = Slot & Token reserviert, sonst (False, Wartezeit oder None = bis release)"""
+        if now < self.paused_until: return False, self.paused_until - now
+        if self.in_flight >= int(self.limit): return False, None
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens < 1: return False, (1 - self.tokens) / self.rate
+            self.tokens -= 1
+        self.in_flight += 1
+        return True, 0
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                ok, wait = self.try_acquire(time.monotonic())
+                if ok: return
+                self.cond.wait(wait)
+
+    async def acquire_async(self):
+        while True:
+            with self.cond: ok, wait = self.try_acquire(time.monotonic())
+            if ok: return
+            await asyncio.sleep(wait if wait is not None else 0.01)
+
+    def cancel(self):
+        """Slot eines abgebrochenen Requests freigeben, ohne Einfluss auf Limit & Latenz"""
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    def release(self, status, latency, retry_after=None):
+        with self.cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            congested = retryable(status)
+            if status == 200:
+                self.base = latency if self.base is None else self.base * 0.9 + latency * 0.1
+                congested = latency > max(3 * self.base, 0.25)
+            if congested:
+                # Gleichzeitige Fehler sind ein Signal: höchstens einmal pro Latenzfenster halbieren
+                if now - self.last_cut > (self.base or 1.0):
+                    self.limit = max(self.min_limit, self.limit * 0.5)
+                    self.last_cut = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if retry_after:
+                if now + retry_after > self.paused_until: metrics.inc("polybot_governor_pauses_total")
+                self.paused_until = max(self.paused_until, now + retry_after)
+            metrics.set("polybot_governor_limit", round(self.limit, 2))
+            self.cond.notify_all()
+
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli else "gzip, deflate"
+
+def http_timeout(read=None):
+    """(Connect, Read) aus der Konfiguration; read kappt den Read-Timeout für schnelle Einzelabfragen"""
+    read_timeout = GLOBAL_CONFIG.get("read_timeout", 10)
+    return GLOBAL_CONFIG.get("connect_timeout", 3.05), min(read, read_timeout) if read else read_timeout
+
+class CountingHTTPConnection(urllib3.connection.HTTPConnection):
+    def connect(self):
+        metrics.inc("polybot_http_connections_total", client="sync")
+        super().connect()
+
+class CountingHTTPSConnection(urllib3.connection.HTTPSConnection):
+    def connect(self):
+        metrics.inc("polybot_http_connections_total", client="sync")
+        super().connect()
+
+class CountingPoolMixin:
+    def _put_conn(self, conn):
+        # Voller Pool: urllib3 schließt die Verbindung, der nächste Request muss neu verbinden
+        if conn is not None and self.pool is not None and self.pool.full():
+            metrics.inc("polybot_http_discarded_total", client="sync")
+        super()._put_conn(conn)
+
+class CountingHTTPConnectionPool(CountingPoolMixin, urllib3.HTTPConnectionPool):
+    ConnectionCls = CountingHTTPConnection
+
+class CountingHTTPSConnectionPool(CountingPoolMixin, urllib3.HTTPSConnectionPool):
+    ConnectionCls = CountingHTTPSConnection
+
+class TransportAdapter(HTTPAdapter):
+    """HTTPAdapter mit zählenden Pools; Wiederholungen nur für Verbindungsaufbau, alles andere wiederholt api_get"""
+    def __init__(self, pool_size):
+        retries = Retry(total=None, connect=2, read=0, status=0, other=0, redirect=3, backoff_factor=0.05, raise_on_status=False)
+        super().__init__(pool_connections=4, pool_maxsize=pool_size, max_retries=retries)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+    def send(self, request, **kwargs):
+        metrics.inc("polybot_http_requests_total", client="sync")
+        return super().send(request, **kwargs)
+
+def make_session(pool_size):
+    """requests-Session der Engine: ein Pool-Platz pro Worker, damit Verbindungen über Zyklen warm bleiben"""
+    session = requests.Session()
+    session.headers.update({"User-Agent": "Mozilla/5.0", "Accept-Encoding": ACCEPT_ENCODING})
+    adapter = TransportAdapter(pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def make_connector(limit):
+    """aiohttp-Connector & TraceConfig: Keep-Alive länger als ein Scan-Takt, Zähler wie beim Thread-Transport"""
+    async def on_request(session, ctx, params): metrics.inc("polybot_http_requests_total", client="async")
+    async def on_connect(session, ctx, params): metrics.inc("polybot_http_connections_total", client="async")
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request)
+    trace.on_connection_create_end.append(on_connect)
+    keepalive = max(15, 2 * GLOBAL_CONFIG.get("check_interval", 30))
+    return aiohttp.TCPConnector(limit=limit, ttl_dns_cache=300, keepalive_timeout=keepalive), [trace]
+
+class Hedger:
+    """Hedging für Markt-Seiten: p95 der zuletzt beobachteten Seiten-Latenzen als Wartezeit bis zum Duplikat,
+    Budget als Guthaben (pro Seite +share, pro Duplikat -1)"""
+    def __init__(self, share, window=200, min_samples=20):
+        self.share = share
+        self.burst = max(1.0, share * 20)
+        self.credit = 0.0
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+
+    def observe(self, latency):
+        self.samples.append(latency)
+
+    def delay(self):
+        """Sekunden bis zum Duplikat; None solange zu wenige Messwerte vorliegen"""
+        if len(self.samples) < self.min_samples: return None
+        ordered = sorted(self.samples)
+        p95 = ordered[int(0.95 * (len(ordered) - 1))]
+        metrics.set("polybot_hedge_delay_seconds", round(p95, 4))
+        return p95
+
+    def request(self):
+        with self.lock: self.credit = min(self.burst, self.credit + self.share)
+
+    def allow(self):
+        with self.lock:
+            if self.credit < 1: return False
+            self.credit -= 1
+        metrics.inc("polybot_hedges_total")
+        return True
+
+GHOST_BET_SECONDS = 300 # Mindestdauer einer Fehlerserie, bevor eine Wette als Ghost Bet erstattet wird
+MONITOR_STOP_BAND = 0.10 # Relativer Abstand zur Stop-Loss-Schwelle, ab dem eine Position als dringend gilt
+MONITOR_END_MINUTES = 10 # Restlaufzeit, ab der eine Position als dringend gilt
 
-        # Paralleles Fetching (IO Bound)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=20) as ex:
-            futures = {ex.submit(load_batch, o): o for o in offsets}
-            for f in concurrent.futures.as_completed(futures):
+class Engine:
+    mode = "thread"
+
+    def __init__(self, clock=None, strategy_map=None):
+        # Uhr und Strategien sind injizierbar (Replay/Backtest), Standard: Echtzeit + globale Strategien
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self.strategy_map = strategy_map
+
+        # OPTIMIERUNG 1: Session für Connection Reuse, Pool so groß wie die Parallelität
+        self.session = make_session(GLOBAL_CONFIG.get("max_concurrency", 20))
+        self.governor = RequestGovernor(GLOBAL_CONFIG.get("api_rate_limit", 0), GLOBAL_CONFIG.get("max_concurrency", 20))
+        self.hedger = Hedger(GLOBAL_CONFIG.get("hedge_budget", 0.05))
+        self.monitor_pool = None # Ein Pool für alle Monitor-Läufe
+        self.monitor_inflight = {} # Future -> Markt-IDs der Monitor-Blöcke, die noch laufen
+        self.hedge_pool = None # Eigener Pool, damit Seite & Duplikat parallel laufen, während der Scan-Worker wartet
+        self.ledger = PositionLedger()
+        self.market_cache = MarketCache()
+        self.last_plan = None
+        self.monitor_interval = 0 # >0: offene Wetten im eigenen Takt (wird beim Start aus der Konfiguration gesetzt)
+        self.price_feed = None
+        self.recorder = SnapshotRecorder(GLOBAL_CONFIG.get("record_dir", "recordings"))
+
+    @property
+    def strategies(self):
+        return self.strategy_map if self.strategy_map is not None else strategies
+
+    def local_now(self):
+        """Lokale Zeit (ohne Zeitzone) der Engine-Uhr, wie sie in Historie & Logs steht"""
+        return self.clock().astimezone().replace(tzinfo=None)
+
+    def persist(self):
+        save_data()
+
+    def fetch_horizon(self):
+        """Größte max_time_min aller laufenden Strategien (+ Puffer) oder None = kein Limit"""
+        if not GLOBAL_CONFIG.get("fetch_horizon", True): return None
+        running = [s.max_time_min for s in list(self.strategies.values()) if s.is_running]
+        if not running: return 0
+        # +1 Min, weil minutes_left abgerundet wird, +1 Min Puffer für die Scan-Dauer
+        return max(running) + 2
+
+    def make_fetch_plan(self):
+        horizon = self.fetch_horizon()
+        plan = FetchPlan(self.clock(), GLOBAL_CONFIG["api_fetch_limit"], 500, horizon)
+        if horizon == 0:
+            # Keine laufende Strategie -> nichts kaufbar, Scan komplett sparen
+            plan.done, plan.offsets, plan.stop_reason = True, [], "keine laufende Strategie"
+        return plan
+
+    def api_get(self, url, endpoint, timeout=None, **kwargs):
+        """GET über die Session und den Governor; 429/5xx/Netzwerkfehler werden bis zur Zyklus-Deadline wiederholt.
+        Latenz & Status jedes Versuchs landen in polybot_gamma_request_seconds"""
+        timeout = timeout or http_timeout()
+        attempt = 0
+        while True:
+            self.governor.acquire()
+            t0 = time.perf_counter()
+            r, error, status, retry_after = None, None, "error", None
+            try:
+                r = self.session.get(url, timeout=timeout, **kwargs)
+                status = r.status_code
+                if retryable(status): retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            except Exception as e:
+                error = e
+            finally:
+                latency = time.perf_counter() - t0
+                metrics.observe("polybot_gamma_request_seconds", latency, endpoint=endpoint, status=status)
+                self.governor.release(status, latency, retry_after)
+
+            delay = retry_after if retry_after is not None else retry_backoff(attempt)
+            if not retryable(status) or time.monotonic() + delay >= request_deadline.get():
+                if error is not None: raise error
+                return r
+            metrics.inc("polybot_gamma_retries_total", endpoint=endpoint)
+            time.sleep(delay)
+            attempt += 1
+
+    @metrics.timer("polybot_phase_seconds", phase="fetch_batch")
+    def load_page(self, params, label):
+        """Lädt eine Markt-Seite; liefert die Liste oder None bei Fehler"""
+        if not GLOBAL_CONFIG.get("hedge_requests"): return self.fetch_page(params, label)
+
+        hedger = self.hedger
+        hedger.request()
+        if self.hedge_pool is None:
+            self.hedge_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2 * GLOBAL_CONFIG.get("max_concurrency", 20))
+        primary = submit_in_context(self.hedge_pool, self.fetch_page, params, label)
+        done, pending = concurrent.futures.wait({primary}, timeout=hedger.delay())
+        if pending and hedger.allow():
+            pending.add(submit_in_context(self.hedge_pool, self.fetch_page, params, f"{label}, Hedge"))
+
+        # Erste erfolgreiche Antwort gewinnt; der Verlierer läuft zu Ende, damit seine Verbindung im Pool bleibt
+        res = None
+        while True:
+            for f in done:
                 res = f.result()
-                if res and isinstance(res, list): all_markets.extend(res)
+                if res is not None:
+                    if f is not primary: metrics.inc("polybot_hedge_wins_total")
+                    return res
+            if not pending: return res
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+
+    def fetch_page(self, params, label):
+        """Ein Seiten-Abruf (inkl. Wiederholungen); die Dauer erfolgreicher Abrufe speist die Hedging-Schwelle"""
+        t0 = time.perf_counter()
+        try:
+            # Nutzt die Session
+            r = self.api_get(gamma_url("/markets"), "markets", params=params)
+            if r.status_code == 200:
+                res = r.json()
+                if isinstance(res, list):
+                    self.hedger.observe(time.perf_counter() - t0)
+                    return res
+
+            if GLOBAL_CONFIG.get("debug"):
+                sys_log(f"DEBUG Batch-Fehler ({label}): Status {r.status_code} - {r.reason}")
+        except Exception as e:
+            if GLOBAL_CONFIG.get("debug"):
+                sys_log(f"DEBUG Batch-Exception ({label}): {e}")
+        return None
+
+    @metrics.timer("polybot_phase_seconds", phase="fetch_markets")
+    def fetch_markets(self, on_page=None):
+        """Kompletter Scan; on_page bekommt jede neue Seite sofort (Pipeline)"""
+        plan = self.make_fetch_plan()
+        if GLOBAL_CONFIG.get("pagination_mode") == "keyset":
+            # Keyset: sequentiell über den endDate-Cursor, konsistent auch wenn sich die Märkte verschieben
+            all_markets = []
+            while not plan.done:
+                rows = plan.feed_keyset(self.load_page(plan.keyset_params(), f"Cursor {plan.cursor}"))
+                all_markets.extend(rows)
+                if on_page: on_page(rows)
+            self.finish_fetch(plan, all_markets)
+            return all_markets
+
+        all_markets = []
+
+        def load_batch(o):
+            return self.load_page(plan.params(o), f"Offset {o}")
+
+        # Paralleles Fetching (IO Bound), wellenweise bis der Horizont überschritten ist
+        with concurrent.futures.ThreadPoolExecutor(max_workers=GLOBAL_CONFIG.get("max_concurrency", 20)) as ex:
+            while not plan.done:
+                futures = {submit_in_context(ex, load_batch, o): o for o in plan.next_wave()}
+                for f in concurrent.futures.as_completed(futures):
+                    res = f.result()
+                    plan.feed(res)
+                    if not res: continue
+                    rows = plan.dedupe(res)
+                    all_markets.extend(rows)
+                    if on_page: on_page(rows)
+        self.finish_fetch(plan, all_markets)
         return all_markets
 
-    def update_single_bet(self, s_id, bet, now):
-        """Hilfsfunktion für paralleles Update einer einzelnen Wette"""
+    def finish_fetch(self, plan, markets):
+        self.last_plan = plan
+        self.recorder.record("scan", markets)
+        if GLOBAL_CONFIG.get("debug") and plan.stop_reason:
+            sys_log(f"DEBUG Fetch-Planer: {plan.pages} Seiten, {len(markets)} Märkte, Stopp: {plan.stop_reason}.")
+        if plan.gaps:
+            sys_log(f"⚠️ Scan unvollständig: {plan.gaps} Seite(n) fehlgeschlagen.")
+
+    def load_ids(self, ids):
+        """Ein Multi-ID Request (max. 50 IDs); liefert die Liste oder [] bei Fehler"""
         try:
-            r = self.session.get(f"https://gamma-api.polymarket.com/markets/{bet['market_id']}", timeout=5)
+            r = self.api_get(gamma_url("/markets"), "markets_by_id", params={"id": ids, "limit": str(len(ids))})
+            if r.status_code == 200: return r.json()
 
-            # --- START: ERROR / GHOST BET HANDLING ---
-            if r.status_code != 200:
-                bet['fail_count'] = bet.get('fail_count', 0) + 1
-                # Wenn > 10 Versuche (ca. 5 Minuten) fehlschlagen -> Wette löschen + Erstatten
-                if bet['fail_count'] > 10:
-                    strat = strategies.get(s_id)
-                    if strat:
-                        strat.balance += bet['amount']
-                        strat.log(f"⚠️ MARKT DEFEKT/GELÖSCHT: {bet['title']} | ${bet['amount']:.2f} erstattet.")
-                    return None, True # None = Löschen
-                return bet, True # Fail Count speichern
-            # --- ENDE: ERROR HANDLING ---
+            if GLOBAL_CONFIG.get("debug"):
+                sys_log(f"DEBUG ID-Batch-Fehler ({len(ids)} IDs): Status {r.status_code} - {r.reason}")
+        except Exception as e:
+            if GLOBAL_CONFIG.get("debug"):
+                sys_log(f"DEBUG ID-Batch-Exception ({len(ids)} IDs): {e}")
+        return []
+
+    def fetch_markets_by_ids(self, market_ids):
+        """Lädt mehrere Märkte gebündelt per Multi-ID Abfrage statt einzeln"""
+        found = {}
+        batch = 50
+        chunks = [market_ids[i:i + batch] for i in range(0, len(market_ids), batch)]
+
+        if not chunks: return found
+        with concurrent.futures.ThreadPoolExecutor(max_workers=GLOBAL_CONFIG.get("max_concurrency", 20)) as ex:
+            futures = [submit_in_context(ex, self.load_ids, c) for c in chunks]
+            for res in (f.result() for f in futures):
+                if res and isinstance(res, list):
+                    for m in res: found[str(m.get("id"))] = m
+        return found
+
+    def register_bet_failure(self, s_id, bet, reason, fail_count, now):
+        """Übernimmt den Fehlerzähler einer Wette und erstattet sie nach zu vielen Fehlern (Ghost Bet)"""
+        bet['fail_count'] = fail_count
+        # Beginn der Fehlerserie wird mitgespeichert, damit die Frist auch Neustarts übersteht
+        since = bet.setdefault('fail_since', now.timestamp())
+        # > 10 Fehlversuche UND seit GHOST_BET_SECONDS ohne Erfolg -> Wette löschen + Erstatten
+        # (zeitbasiert, sonst reichen im schnellen Monitor-Takt wenige Sekunden Ausfall)
+        if fail_count > 10 and now.timestamp() - since >= GHOST_BET_SECONDS:
+            strat = self.strategies.get(s_id)
+            if strat:
+                strat.balance += bet['amount']
+                strat.log(f"⚠️ {reason}: {bet['title']} | ${bet['amount']:.2f} erstattet.")
+            return None, True # None = Löschen
+        return bet, True # Fail Count speichern
+
+    def apply_entry_to_bet(self, s_id, bet, entry, now):
+        """Überträgt den gemeinsamen Marktzustand auf eine Wette und prüft Stop-Loss / Auflösung"""
+        strat = self.strategies.get(s_id)
+        if not strat: return bet, False
+
+        bet['fail_count'] = 0 # Reset Fail Count bei Erfolg
+        bet.pop('fail_since', None)
+
+        # Update Data (bereits 1x pro Markt im Ledger geparst)
+        prices = entry.prices # Einmal lesen: der Preis-Feed ersetzt das dict parallel
+        if prices is not None and bet["picked_outcome"] in prices:
+            bet["current_price"] = prices[bet["picked_outcome"]]
+
+        if entry.end is not None:
+            seconds_left = int((entry.end - now).total_seconds())
+            bet["minutes_left"] = seconds_left // 60
+
+            if seconds_left <= 0: bet["time_str"] = "Warte..."
+            elif seconds_left > 3600: bet["time_str"] = f"{seconds_left // 3600}h {(seconds_left % 3600) // 60}m"
+            else: bet["time_str"] = f"{seconds_left // 60}m {seconds_left % 60}s"
+
+        # LOGIC CHECKS
+        if strat.is_running and strat.stop_loss_trigger > 0 and bet["current_price"] < (bet["entry_price"] * strat.stop_loss_trigger) and not entry.closed:
+            # STOP LOSS EXECUTION
+            shares = bet["amount"] / bet["entry_price"]
+            revenue = shares * bet["current_price"]
+            loss = bet["amount"] - revenue
+            strat.balance += revenue
+            strat.losses += 1
+
+            # DETAILED LOG
+            strat.log(f"🛑 STOP-LOSS: {bet['title']} | Exit @ {bet['current_price']:.2f} | PnL: -${loss:.2f}")
+
+            strat.history.append({"status":"STOP-LOSS", "title":bet["title"], "slug": bet.get("slug", ""), "pnl":-loss, "close_time": self.local_now().isoformat()})
+            return None, True
+
+        if entry.closed is True:
+            # WIN/LOSS EXECUTION
+            won = bet["current_price"] > 0.95
+            revenue = (bet["amount"]/bet["entry_price"])*1.0 if won else 0
+            profit = revenue - bet["amount"] if won else -bet["amount"]
+            strat.balance += revenue
+            if won: strat.wins += 1
+            else: strat.losses += 1
+
+            # DETAILED LOG
+            roi = ((revenue - bet["amount"]) / bet["amount"]) * 100
+            if won:
+                strat.log(f"✅ WIN: {bet['title']} | Profit: +${profit:.2f} ({roi:.1f}%)")
+            else:
+                strat.log(f"❌ LOSS: {bet['title']} | Verlust: -${bet['amount']:.2f}")
 
-            m = r.json()
-            strat = strategies.get(s_id)
-            if not strat: return bet, False
+            strat.history.append({"status":"WIN" if won else "LOSS", "title":bet["title"], "slug": bet.get("slug", ""), "pnl":profit, "close_time": self.local_now().isoformat()})
+            return None, True
 
-            dirty = False
-            bet['fail_count'] = 0 # Reset Fail Count bei Erfolg
+        return bet, False
 
-            # Update Data
-            try:
-                outcomes = json.loads(m.get("outcomes", "[]"))
-                prices = [float(p) for p in json.loads(m.get("outcomePrices", "[]"))]
-                if bet["picked_outcome"] in outcomes:
-                    idx = outcomes.index(bet["picked_outcome"])
-                    bet["current_price"] = prices[idx]
-
-                end = datetime.fromisoformat(m["endDate"].replace('Z', '+00:00'))
-                seconds_left = int((end - now).total_seconds())
-                bet["minutes_left"] = seconds_left // 60
-
-                if seconds_left <= 0: bet["time_str"] = "Warte..."
-                elif seconds_left > 3600: bet["time_str"] = f"{seconds_left // 3600}h {(seconds_left % 3600) // 60}m"
-                else: bet["time_str"] = f"{seconds_left // 60}m {seconds_left % 60}s"
-            except: pass
+    def fetch_single_market(self, market_id):
+        """Lädt einen einzelnen Markt; liefert (Markt, None) oder (None, Fehlergrund)"""
+        try:
+            r = self.api_get(gamma_url(f"/markets/{market_id}"), "market", timeout=http_timeout(5))
+
+            # --- START: ERROR / GHOST BET HANDLING ---
+            if r.status_code != 200:
+                return None, "MARKT DEFEKT/GELÖSCHT"
+            # --- ENDE: ERROR HANDLING ---
 
-            # LOGIC CHECKS
-            if strat.is_running and strat.stop_loss_trigger > 0 and bet["current_price"] < (bet["entry_price"] * strat.stop_loss_trigger) and not m.get("closed"):
-                # STOP LOSS EXECUTION
-                shares = bet["amount"] / bet["entry_price"]
-                revenue = shares * bet["current_price"]
-                loss = bet["amount"] - revenue
-                strat.balance += revenue
-                strat.losses += 1
-
-                # DETAILED LOG
-                strat.log(f"🛑 STOP-LOSS: {bet['title']} | Exit @ {bet['current_price']:.2f} | PnL: -${loss:.2f}")
-
-                strat.history.append({"status":"STOP-LOSS", "title":bet["title"], "slug": bet.get("slug", ""), "pnl":-loss, "close_time": datetime.now().isoformat()})
-                return None, True
-
-            if m.get("closed") is True:
-                # WIN/LOSS EXECUTION
-                won = bet["current_price"] > 0.95
-                revenue = (bet["amount"]/bet["entry_price"])*1.0 if won else 0
-                profit = revenue - bet["amount"] if won else -bet["amount"]
-                strat.balance += revenue
-                if won: strat.wins += 1
-                else: strat.losses += 1
-
-                # DETAILED LOG
-                roi = ((revenue - bet["amount"]) / bet["amount"]) * 100
-                if won:
-                    strat.log(f"✅ WIN: {bet['title']} | Profit: +${profit:.2f} ({roi:.1f}%)")
-                else:
-                    strat.log(f"❌ LOSS: {bet['title']} | Verlust: -${bet['amount']:.2f}")
-
-                strat.history.append({"status":"WIN" if won else "LOSS", "title":bet["title"], "slug": bet.get("slug", ""), "pnl":profit, "close_time": datetime.now().isoformat()})
-                return None, True
-
-            return bet, False
+            return r.json(), None
         except Exception as e:
             # Auch bei Exception den Fail Count hochzählen
-            bet['fail_count'] = bet.get('fail_count', 0) + 1
-            if bet['fail_count'] > 10:
-                strat = strategies.get(s_id)
-                if strat:
-                    strat.balance += bet['amount']
-                    strat.log(f"⚠️ MARKT FEHLER (NETZWERK): {bet['title']} | ${bet['amount']:.2f} erstattet.")
-                return None, True
-            return bet, True
-
-    def update_active_bets(self):
-        # OPTIMIERUNG 2: Paralleles Update der aktiven Wetten
-        tasks = []
-        now = datetime.now(timezone.utc)
-
-        # Sammle alle Tasks
-        for s_id, strat in list(strategies.items()):
-            if not strat.active_bets: continue
+            return None, "MARKT FEHLER (NETZWERK)"
+
+    @metrics.timer("polybot_phase_seconds", phase="update_active_bets")
+    def update_active_bets(self, scan_markets=None):
+        # OPTIMIERUNG 2: Ein Update pro Markt (Ledger), Ergebnis wird auf alle Positionen verteilt
+        now = self.clock()
+        entries = self.ledger.rebuild(self.strategies)
+        if not entries: return
+        fetched = self.refresh_ledger_markets(list(entries), scan_markets)
+        self.apply_ledger_updates(entries, fetched, now)
+
+    def split_scan_hits(self, market_ids, scan_markets):
+        """Trennt Ledger-Märkte in Treffer aus dem Scan und fehlende IDs"""
+        by_id = {str(m.get("id")): m for m in scan_markets}
+        return by_id, [mid for mid in market_ids if mid not in by_id]
+
+    def refresh_ledger_markets(self, market_ids, scan_markets=None):
+        """Liefert {market_id: (Markt oder None, Fehlergrund)} für alle Ledger-Märkte"""
+        if scan_markets is not None:
+            # Aus dem Scan-Ergebnis; nur fehlende Märkte per Multi-ID Batch nachladen
+            by_id, missing = self.split_scan_hits(market_ids, scan_markets)
+            if missing:
+                by_id.update(self.fetch_markets_by_ids(missing))
+                if GLOBAL_CONFIG.get("debug"):
+                    sys_log(f"DEBUG Wetten-Update: {len(market_ids) - len(missing)} Märkte aus Scan, {len(missing)} nachgeladen.")
+            return {mid: (by_id.get(mid), "MARKT DEFEKT/GELÖSCHT") for mid in market_ids}
+
+        # Ein GET pro Markt (nicht pro Wette), parallel
+        with concurrent.futures.ThreadPoolExecutor(max_workers=GLOBAL_CONFIG.get("max_concurrency", 20)) as ex:
+            futures = [submit_in_context(ex, self.fetch_single_market, mid) for mid in market_ids]
+            return dict(zip(market_ids, [f.result() for f in futures]))
+
+    def apply_ledger_updates(self, entries, fetched, now, persist=True):
+        """Pro Markt 1x aktualisieren, dann auf alle Positionen auffächern und zurückschreiben; True = geändert"""
+        self.recorder.record("bets", [m for m, _ in fetched.values() if m is not None])
+        work = {} # s_id -> [(bet, entry, markt, grund)] in Markt-Reihenfolge
+        for mid in entries:
+            entry = entries[mid]
+            m, reason = fetched[mid]
+            entry.apply_fetch(m)
+            for s_id, bet in entry.positions:
+                work.setdefault(s_id, []).append((bet, entry, m, reason))
+
+        save_needed = False
+        for s_id, strat in list(self.strategies.items()):
+            if s_id in work and self.apply_bet_updates(s_id, strat, work[s_id], now): save_needed = True
+
+        if save_needed and persist: self.persist()
+        return save_needed
+
+    def apply_bet_updates(self, s_id, strat, work, now):
+        """Markt-Updates einer Strategie unter ihrem Lock anwenden und zurückschreiben; True = geändert"""
+        with strat._lock:
+            # Während des Netzwerk-Abrufs zurückgesetzte/entfernte Wetten nicht mehr abrechnen
+            live = {id(b) for b in strat.active_bets}
+            outcome = {} # id(bet) -> (bet oder None, dirty)
+            for bet, entry, m, reason in work:
+                if id(bet) not in live: continue
+                try:
+                    if m is None: res = self.register_bet_failure(s_id, bet, reason, entry.fail_count, now)
+                    else: res = self.apply_entry_to_bet(s_id, bet, entry, now)
+                except Exception:
+                    res = self.register_bet_failure(s_id, bet, "MARKT FEHLER (NETZWERK)", bet.get('fail_count', 0) + 1, now)
+                outcome[id(bet)] = res
+
+            # Reihenfolge der Wetten bleibt erhalten
+            bets, dirty = [], False
             for bet in strat.active_bets:
-                tasks.append((s_id, bet))
+                res_bet, is_dirty = outcome.get(id(bet), (bet, False))
+                if is_dirty: dirty = True
+                if res_bet: bets.append(res_bet)
+            if len(strat.active_bets) != len(bets) or dirty:
+                strat.active_bets = bets
+                return True
+        return False
+
+    def apply_price_tick(self, entry, outcome, price):
+        """Preis-Tick aus dem Feed: betroffene Positionen sofort neu bewerten (Stop-Loss); True = Wette geschlossen"""
+        prices = entry.prices
+        if prices is None or entry.closed: return False
+        # Copy-on-Write: update() und andere Leser sehen immer ein vollständiges dict
+        prices = dict(prices)
+        prices[outcome] = price
+        entry.prices = prices
+        now, closed = self.clock(), False
+        for s_id, bet in list(entry.positions):
+            if bet["picked_outcome"] != outcome: continue
+            strat = self.strategies.get(s_id)
+            if strat is None: continue
+            with strat._lock:
+                # Inzwischen vom Poll geschlossene oder zurückgesetzte Wetten nicht mehr anfassen
+                if not any(b is bet for b in strat.active_bets): continue
+                res, _ = self.apply_entry_to_bet(s_id, bet, entry, now)
+                if res is None:
+                    strat.active_bets = [b for b in strat.active_bets if b is not bet]
+                    closed = True
+        if closed: self.persist()
+        return closed
+
+    def start_price_feed(self):
+        if not GLOBAL_CONFIG.get("price_feed"): return
+        if aiohttp is None:
+            sys_log("⚠️ price_feed braucht aiohttp (pip install aiohttp) – es läuft nur Polling.")
+            return
+        self.price_feed = PriceFeed(self, GLOBAL_CONFIG.get("price_feed_url"))
+        self.price_feed.start()
+
+    def monitor_order(self, entries):
+        """Markt-IDs nach Dringlichkeit: Positionen nahe am Stop-Loss oder am endDate zuerst"""
+        def urgency(mid):
+            score = float("inf")
+            for s_id, bet in entries[mid].positions:
+                strat = self.strategies.get(s_id)
+                if strat is not None and strat.stop_loss_trigger > 0 and bet["entry_price"] > 0:
+                    # 1.0 = Rand des Bands, <= 0 = Schwelle schon unterschritten
+                    margin = (bet["current_price"] - bet["entry_price"] * strat.stop_loss_trigger) / bet["entry_price"]
+                    score = min(score, margin / MONITOR_STOP_BAND)
+                score = min(score, max(bet.get("minutes_left", 0), 0) / MONITOR_END_MINUTES)
+            return score
+        return sorted(entries, key=urgency)
+
+    def monitor_chunks(self, entries):
+        """Abruf-Blöcke in Prioritätsreihenfolge: ein GET pro Markt ("single") oder Multi-ID Blöcke à 50"""
+        order = self.monitor_order(entries)
+        size = 1 if GLOBAL_CONFIG.get("bet_refresh_mode", "scan") == "single" else 50
+        return [order[i:i + size] for i in range(0, len(order), size)]
+
+    def load_monitor_chunk(self, ids):
+        if len(ids) == 1 and GLOBAL_CONFIG.get("bet_refresh_mode", "scan") == "single":
+            return ids, {ids[0]: self.fetch_single_market(ids[0])}
+        found = {str(m.get("id")): m for m in self.load_ids(ids) or []}
+        return ids, {mid: (found.get(mid), "MARKT DEFEKT/GELÖSCHT") for mid in ids}
+
+    @metrics.timer("polybot_phase_seconds", phase="monitor")
+    def monitor_positions(self):
+        """Schneller Takt: nur offene Wetten aktualisieren (Stop-Loss, Auflösung), dringendste zuerst.
+        Was bis zum nächsten Takt nicht geladen ist, bleibt für den nächsten Lauf liegen."""
+        entries = self.ledger.rebuild(self.strategies)
+        deadline = time.monotonic() + self.monitor_interval
+        request_deadline.set(deadline) # Wiederholungen nur bis zum nächsten Monitor-Takt
+        if self.monitor_pool is None:
+            self.monitor_pool = concurrent.futures.ThreadPoolExecutor(max_workers=GLOBAL_CONFIG.get("max_concurrency", 20))
+        save_needed = False
 
-        if not tasks: return
+        # Blöcke, die beim letzten Takt noch liefen: fertige jetzt anwenden, laufende nicht doppelt anfragen
+        busy = set()
+        for f, ids in list(self.monitor_inflight.items()):
+            if not f.done():
+                busy.update(ids)
+                continue
+            del self.monitor_inflight[f]
+            if self.apply_monitor_chunk(entries, *f.result()): save_needed = True
+        todo = {mid: e for mid, e in entries.items() if mid not in busy}
+        pending = len(entries)
+
+        # Warteschlange = Priorität; laufende Blöcke überdauern den Takt, wartende werden verworfen
+        futures = {submit_in_context(self.monitor_pool, self.load_monitor_chunk, ids): ids for ids in self.monitor_chunks(todo)}
+        self.monitor_inflight.update(futures)
+        try:
+            for f in concurrent.futures.as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                del self.monitor_inflight[f]
+                # Jeden Block sofort anwenden, damit dringende Stop-Loss nicht auf langsame Blöcke warten
+                if self.apply_monitor_chunk(entries, *f.result()): save_needed = True
+                pending -= len(futures[f])
+        except concurrent.futures.TimeoutError:
+            for f in futures:
+                if f.cancel(): del self.monitor_inflight[f]
+
+        metrics.set("polybot_monitor_deferred_markets", pending)
+        if save_needed: self.persist()
+
+    def apply_monitor_chunk(self, entries, ids, fetched):
+        """Ergebnis eines Monitor-Blocks anwenden (nur Märkte, die noch offene Positionen haben)"""
+        live = {mid: entries[mid] for mid in ids if mid in entries}
+        return self.apply_ledger_updates(live, fetched, self.clock(), persist=False)
+
+    def monitor_loop(self):
+        schedule = FixedRate("monitor", lambda: self.monitor_interval)
+        while True:
+            schedule.begin()
+            try:
+                with profiler.track("monitor"): self.monitor_positions()
+            except Exception as e:
+                sys_log(f"Fehler im Monitor: {e}")
+            time.sleep(schedule.delay())
+
+    def process_strategies(self, raw_markets):
+        now = self.clock()
 
-        # Ausführen
-        results_map = {s_id: [] for s_id in strategies} # Puffer für Ergebnisse
-        dirty_flags = {s_id: False for s_id in strategies}
+        with metrics.timer("polybot_phase_seconds", phase="preprocess"):
+            # OPTIMIERUNG 3: Pre-Processing der Märkte (JSON Parsing nur bei geänderten Rohdaten)
+            processed_markets = self.market_cache.process(raw_markets, now)
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=20) as ex:
-            futures = {ex.submit(self.update_single_bet, s_id, bet, now): s_id for s_id, bet in tasks}
+            # OPTIMIERUNG 4: Spalten-Matrix -> alle Filter einer Strategie als eine Maske
+            matrix = MarketMatrix(processed_markets)
 
-            for f in concurrent.futures.as_completed(futures):
-                s_id = futures[f]
-                try:
-                    res_bet, is_dirty = f.result()
-                    if is_dirty: dirty_flags[s_id] = True
-                    if res_bet: results_map[s_id].append(res_bet)
-                except: pass
+        if GLOBAL_CONFIG.get("debug"):
+            st = self.market_cache.stats
+            sys_log(f"DEBUG Markt-Cache: {st['parsed']} Felder neu geparst, {st['reused']} Märkte unverändert, {st['evicted']} verworfen.")
 
-        # Ergebnisse zurückschreiben
+        # Jetzt Strategien gegen die vorverarbeiteten Märkte laufen lassen
         save_needed = False
-        for s_id, bets in results_map.items():
-            if s_id in strategies:
-                if len(strategies[s_id].active_bets) != len(bets) or dirty_flags[s_id]:
-                    strategies[s_id].active_bets = bets
-                    save_needed = True
+        with metrics.timer("polybot_phase_seconds", phase="evaluate"):
+            for s_id, strat in list(self.strategies.items()):
+                # Unter dem Strategie-Lock: Routen können Konfiguration & Wetten nicht mitten im Kauf ändern
+                with strat._lock:
+                    if self.evaluate_strategy(strat, matrix, processed_markets): save_needed = True
+
+        if save_needed: self.persist()
+
+    def evaluate_strategy(self, strat, matrix, processed_markets):
+        """Kauflogik einer Strategie über die Kandidaten der Matrix; True = neue Wetten"""
+        buy = BuyPass(strat)
+        buy.feed(matrix, processed_markets)
+        return buy.bought
+
+    def startup(self):
+        global strategies
+        sys_log(f"🚀 PolyBot Pro Engine gestartet ({self.mode}).")
+        load_data()
+        if not strategies:
+            s = Strategy()
+            with strategies_lock: strategies = {s.id: s}
+            save_data()
+        publish_dashboard()
+
+    def log_cycle(self, markets, duration):
+        self.record_cycle_metrics(markets, duration)
+        profiler.cycle_done(duration)
+        publish_dashboard()
+        state_bus.bump("navbar") # "Aktualisiert" Zeitstempel
+        plan = self.last_plan
+        if plan is not None:
+            sys_log(f"Scan fertig: {len(markets)} Märkte verarbeitet ({plan.pages} Seiten, {plan.duplicates} Duplikate, {plan.gaps} Lücken, {duration:.2f}s).")
+        else:
+            sys_log(f"Scan fertig: {len(markets)} Märkte verarbeitet ({duration:.2f}s).")
+
+        # Ein vom Fetch-Planer bewusst beendeter Scan ist kein verfehltes Ziel
+        planned_stop = self.last_plan is not None and self.last_plan.stop_reason
+        if GLOBAL_CONFIG.get("debug") and not planned_stop and len(markets) < GLOBAL_CONFIG["api_fetch_limit"]:
+            sys_log(f"⚠️ DEBUG: Ziel verfehlt! {len(markets)}/{GLOBAL_CONFIG['api_fetch_limit']} Märkte. Mögliche API-Limits oder Timeouts.")
+
+    def record_cycle_metrics(self, markets, duration):
+        strats = list(self.strategies.values())
+        overrun = max(0.0, duration - GLOBAL_CONFIG["check_interval"])
+        metrics.observe("polybot_phase_seconds", duration, phase="cycle")
+        metrics.set("polybot_markets_scanned", len(markets))
+        metrics.set("polybot_open_bets", sum(len(s.active_bets) for s in strats))
+        metrics.set("polybot_strategies_running", sum(1 for s in strats if s.is_running))
+        metrics.set("polybot_cycle_duration_seconds", round(duration, 4))
+        metrics.set("polybot_cycle_overrun_seconds", round(overrun, 4))
+        if overrun > 0: metrics.inc("polybot_cycle_overruns_total")
+
+    def run_cycle(self):
+        request_deadline.set(time.monotonic() + GLOBAL_CONFIG.get("retry_deadline", 15))
+        if GLOBAL_CONFIG.get("scan_pipeline"): return self.run_cycle_pipelined()
+        start_time = time.time()
+
+        if self.monitor_interval > 0:
+            # Offene Wetten laufen im Monitor-Takt, hier nur neue Märkte suchen
+            markets = self.fetch_markets()
+        elif GLOBAL_CONFIG.get("bet_refresh_mode", "scan") == "scan":
+            # 1. Fetch Markets (Parallel + Session)
+            markets = self.fetch_markets()
+
+            # 2. Update Active Bets aus dem Scan (nur Fehlende per Batch nachladen)
+            self.update_active_bets(markets)
+        else:
+            # 1. Update Active Bets (Parallel, ein GET pro Markt)
+            self.update_active_bets()
 
-        if save_needed: save_data()
+            # 2. Fetch Markets (Parallel + Session)
+            markets = self.fetch_markets()
 
-    def process_strategies(self, raw_markets):
-        now = datetime.now(timezone.utc)
+        # 3. Process (Pre-Compiled)
+        metrics.observe("polybot_phase_seconds", time.time() - start_time, phase="first_decision")
+        self.process_strategies(markets)
 
-        # OPTIMIERUNG 3: Pre-Processing der Märkte (JSON Parsing nur 1x pro Loop)
-        processed_markets = []
-        for m in raw_markets:
-            try:
-                # Extrahiere Daten einmalig
-                outcomes = json.loads(m.get("outcomes", "[]"))
-                prices = [float(p) for p in json.loads(m.get("outcomePrices", "[]"))]
-
-                best_price, best_outcome = 0, None
-                for i, p in enumerate(prices):
-                    if p > best_price: best_price, best_outcome = p, outcomes[i]
-
-                end = datetime.fromisoformat(m["endDate"].replace('Z', '+00:00'))
-                seconds_left = int((end - now).total_seconds())
-                minutes_left = seconds_left // 60
-
-                processed_markets.append({
-                    "raw": m, # Referenz aufs Original für ID, Title etc.
-                    "tags": str(m.get("tags", [])).lower(),
-                    "spread": float(m.get("spread", 0)),
-                    "liquidity": float(m.get("liquidity", 0)),
-                    "minutes_left": minutes_left,
-                    "seconds_left": seconds_left,
-                    "best_price": best_price,
-                    "best_outcome": best_outcome
-                })
-            except: continue
+        self.log_cycle(markets, time.time() - start_time)
 
-        # Jetzt Strategien gegen die vorverarbeiteten Märkte laufen lassen
-        save_needed = False
-        for s_id, strat in list(strategies.items()):
-            if not strat.is_running: continue
-
-            # Budget Check
-            bet_amount = strat.get_equity() * strat.bet_percentage
-            if bet_amount < 1.0: continue
-
-            # IDs der aktiven Wetten cachen für schnellen Lookup
-            active_ids = {b['market_id'] for b in strat.active_bets}
-
-            for pm in processed_markets:
-                m = pm["raw"]
-                if m['id'] in active_ids: continue
-
-                # Checks auf vorverarbeiteten Daten (Viel schneller!)
-                if strat.category_filter and strat.category_filter.lower() not in pm["tags"]: continue
-                if pm["spread"] > strat.max_spread: continue
-                if pm["liquidity"] < strat.min_liquidity: continue
-                if pm["minutes_left"] <= 0 or pm["minutes_left"] > strat.max_time_min: continue
-
-                if strat.min_prob <= pm["best_price"] <= strat.max_prob:
-                    # Check funds
-                    if strat.balance < bet_amount:
-                        break
-
-                    # KAUF SIGNAL
-                    strat.balance -= bet_amount
-
-                    # DETAILED LOG
-                    strat.log(f"🚀 KAUF: {m['question']} | ${bet_amount:.2f} auf {pm['best_outcome']} @ {pm['best_price']:.2f}")
-
-                    if pm["seconds_left"] > 3600: t_str = f"{pm['seconds_left'] // 3600}h {(pm['seconds_left'] % 3600) // 60}m"
-                    else: t_str = f"{pm['seconds_left'] // 60}m {pm['seconds_left'] % 60}s"
-
-                    strat.active_bets.append({
-                        "market_id": m["id"],
-                        "slug": m.get("slug",""),
-                        "title": m["question"],
-                        "picked_outcome": pm["best_outcome"],
-                        "entry_price": pm["best_price"],
-                        "current_price": pm["best_price"],
-                        "amount": bet_amount,
-                        "time_str": t_str,
-                        "minutes_left": pm["minutes_left"],
-                        "fail_count": 0
-                    })
-                    active_ids.add(m['id']) # Verhindert doppelkauf im gleichen Loop
-                    save_needed = True
-
-        if save_needed: save_data()
+    def run_cycle_pipelined(self):
+        """Wie run_cycle, aber jede Seite wird beim Eintreffen geparst und bewertet"""
+        start_time = time.time()
+        from_scan = GLOBAL_CONFIG.get("bet_refresh_mode", "scan") == "scan"
+        pipe = ScanPipeline(self, from_scan, track_bets=self.monitor_interval <= 0)
 
-    def run(self):
-        sys_log("🚀 PolyBot Pro Engine gestartet.")
-        load_data()
-        if not strategies: s = Strategy(); strategies[s.id] = s; save_data()
+        if not from_scan and pipe.entries:
+            # Wie im Batch: Wetten zuerst per Einzel-GET aktualisieren
+            with metrics.timer("polybot_phase_seconds", phase="update_active_bets"):
+                pipe.settle(self.refresh_ledger_markets(list(pipe.entries)))
+
+        markets = self.fetch_markets(on_page=pipe.feed)
+
+        if from_scan:
+            # Wetten-Märkte, die nicht im Scan waren, per Multi-ID Batch nachladen
+            with metrics.timer("polybot_phase_seconds", phase="update_active_bets"):
+                missing = pipe.missing()
+                found = self.fetch_markets_by_ids(missing) if missing else {}
+                if missing and GLOBAL_CONFIG.get("debug"):
+                    sys_log(f"DEBUG Wetten-Update: {len(pipe.entries) - len(missing)} Märkte aus Scan, {len(missing)} nachgeladen.")
+                pipe.settle({mid: (m, "MARKT DEFEKT/GELÖSCHT") for mid, m in found.items()})
 
+        pipe.finish()
+        self.log_cycle(markets, time.time() - start_time)
+
+    def run(self):
+        self.startup()
+        self.start_price_feed()
+        self.monitor_interval = GLOBAL_CONFIG.get("monitor_interval", 0)
+        if self.monitor_interval > 0:
+            sys_log(f"Monitor-Takt für offene Wetten: {self.monitor_interval}s, Markt-Scan: {GLOBAL_CONFIG['check_interval']}s.")
+            threading.Thread(target=self.monitor_loop, daemon=True).start()
+
+        schedule = FixedRate("discovery", lambda: GLOBAL_CONFIG["check_interval"])
         while True:
+            schedule.begin()
             try:
-                start_time = time.time()
+                with profiler.track("engine"): self.run_cycle()
+            except Exception as e:
+                sys_log(f"Fehler im Loop: {e}")
+            time.sleep(schedule.delay())
 
-                # 1. Update Active Bets (Parallel)
-                self.update_active_bets()
+# --- ASYNCIO ENGINE ---
+async def timed_async(phase, coro):
+    with metrics.timer("polybot_phase_seconds", phase=phase):
+        return await coro
 
-                # 2. Fetch Markets (Parallel + Session)
-                markets = self.fetch_markets()
+class AsyncEngine(Engine):
+    """Engine-Variante: ein Event-Loop, begrenzte Parallelität per Semaphore, persistenter aiohttp-Client"""
+    mode = "async"
 
-                # 3. Process (Pre-Compiled)
-                self.process_strategies(markets)
+    def __init__(self):
+        super().__init__()
+        self.client = None
+        self.scan_sem = None
+        self.bet_sem = None
+        self.hedge_tasks = set() # Laufende Hedging-Verlierer (Referenz halten, bis sie fertig sind)
+
+    async def get_json(self, sem, url, params=None, timeout=None, endpoint="markets"):
+        """GET über den persistenten Client und den Governor, Wiederholung wie api_get; liefert (Status, Grund, JSON oder None)"""
+        connect, read = timeout or http_timeout()
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+        attempt = 0
+        while True:
+            async with sem:
+                await self.governor.acquire_async()
+                t0 = time.perf_counter()
+                result, error, status, retry_after = None, None, "error", None
+                try:
+                    async with self.client.get(url, params=params, timeout=client_timeout) as r:
+                        status = r.status
+                        data = await r.json(content_type=None) if r.status == 200 else None
+                        if retryable(status): retry_after = parse_retry_after(r.headers.get("Retry-After"))
+                        result = r.status, r.reason, data
+                except asyncio.CancelledError:
+                    # Abbruch durch den Aufrufer (z.B. Monitor-Überlauf) ist kein Stau: Slot freigeben, keine Fehler-Metrik
+                    self.governor.cancel()
+                    raise
+                except Exception as e:
+                    error = e
+                latency = time.perf_counter() - t0
+                metrics.observe("polybot_gamma_request_seconds", latency, endpoint=endpoint, status=status)
+                self.governor.release(status, latency, retry_after)
+
+            delay = retry_after if retry_after is not None else retry_backoff(attempt)
+            if not retryable(status) or time.monotonic() + delay >= request_deadline.get():
+                if error is not None: raise error
+                return result
+            metrics.inc("polybot_gamma_retries_total", endpoint=endpoint)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def load_page_async(self, params, label):
+        with metrics.timer("polybot_phase_seconds", phase="fetch_batch"):
+            if not GLOBAL_CONFIG.get("hedge_requests"): return await self.fetch_page_async(params, label)
+
+            hedger = self.hedger
+            hedger.request()
+            primary = asyncio.ensure_future(self.fetch_page_async(params, label))
+            done, pending = await asyncio.wait({primary}, timeout=hedger.delay())
+            if pending and hedger.allow():
+                pending.add(asyncio.ensure_future(self.fetch_page_async(params, f"{label}, Hedge")))
+
+            # Wie im Thread-Modus: Verlierer nicht abbrechen (Abbruch schließt die Verbindung und zählt im Governor als Fehler)
+            res = None
+            while True:
+                for t in done:
+                    res = t.result()
+                    if res is not None:
+                        if t is not primary: metrics.inc("polybot_hedge_wins_total")
+                        for loser in pending:
+                            self.hedge_tasks.add(loser)
+                            loser.add_done_callback(self.hedge_tasks.discard)
+                        return res
+                if not pending: return res
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+    async def fetch_page_async(self, params, label):
+        t0 = time.perf_counter()
+        try:
+            status, reason, data = await self.get_json(self.scan_sem, gamma_url("/markets"), params)
+            if status == 200 and isinstance(data, list):
+                self.hedger.observe(time.perf_counter() - t0)
+                return data
 
-                duration = time.time() - start_time
-                sys_log(f"Scan fertig: {len(markets)} Märkte verarbeitet ({duration:.2f}s).")
+            if GLOBAL_CONFIG.get("debug"):
+                sys_log(f"DEBUG Batch-Fehler ({label}): Status {status} - {reason}")
+        except Exception as e:
+            if GLOBAL_CONFIG.get("debug"):
+                sys_log(f"DEBUG Batch-Exception ({label}): {e!r}")
+        return None
 
-                if GLOBAL_CONFIG.get("debug") and len(markets) < GLOBAL_CONFIG["api_fetch_limit"]:
-                    sys_log(f"⚠️ DEBUG: Ziel verfehlt! {len(markets)}/{GLOBAL_CONFIG['api_fetch_limit']} Märkte. Mögliche API-Limits oder Timeouts.")
+    async def fetch_markets_async(self, on_page=None):
+        all_markets = []
+        plan = self.make_fetch_plan()
+        if GLOBAL_CONFIG.get("pagination_mode") == "keyset":
+            while not plan.done:
+                rows = plan.feed_keyset(await self.load_page_async(plan.keyset_params(), f"Cursor {plan.cursor}"))
+                all_markets.extend(rows)
+                if on_page: on_page(rows)
+            self.finish_fetch(plan, all_markets)
+            return all_markets
+
+        while not plan.done:
+            pages = [self.load_page_async(plan.params(o), f"Offset {o}") for o in plan.next_wave()]
+            for coro in asyncio.as_completed(pages):
+                res = await coro
+                plan.feed(res)
+                if not res: continue
+                rows = plan.dedupe(res)
+                all_markets.extend(rows)
+                if on_page: on_page(rows)
+        self.finish_fetch(plan, all_markets)
+        return all_markets
 
+    async def load_ids_async(self, ids):
+        try:
+            params = [("id", i) for i in ids] + [("limit", str(len(ids)))]
+            status, reason, data = await self.get_json(self.bet_sem, gamma_url("/markets"), params, endpoint="markets_by_id")
+            if status == 200: return data
+
+            if GLOBAL_CONFIG.get("debug"):
+                sys_log(f"DEBUG ID-Batch-Fehler ({len(ids)} IDs): Status {status} - {reason}")
+        except Exception as e:
+            if GLOBAL_CONFIG.get("debug"):
+                sys_log(f"DEBUG ID-Batch-Exception ({len(ids)} IDs): {e!r}")
+        return []
+
+    async def fetch_markets_by_ids_async(self, market_ids):
+        found = {}
+        batch = 50
+        chunks = [market_ids[i:i + batch] for i in range(0, len(market_ids), batch)]
+        for res in await asyncio.gather(*(self.load_ids_async(c) for c in chunks)):
+            if res and isinstance(res, list):
+                for m in res: found[str(m.get("id"))] = m
+        return found
+
+    async def fetch_single_market_async(self, market_id):
+        try:
+            status, _, data = await self.get_json(self.bet_sem, gamma_url(f"/markets/{market_id}"), timeout=http_timeout(5), endpoint="market")
+            if status != 200: return None, "MARKT DEFEKT/GELÖSCHT"
+            return data, None
+        except Exception:
+            return None, "MARKT FEHLER (NETZWERK)"
+
+    async def update_active_bets_async(self, scan_markets=None):
+        now = self.clock()
+        entries = self.ledger.rebuild(self.strategies)
+        if not entries: return
+        market_ids = list(entries)
+
+        if scan_markets is not None:
+            by_id, missing = self.split_scan_hits(market_ids, scan_markets)
+            if missing: by_id.update(await self.fetch_markets_by_ids_async(missing))
+            fetched = {mid: (by_id.get(mid), "MARKT DEFEKT/GELÖSCHT") for mid in market_ids}
+        else:
+            results = await asyncio.gather(*(self.fetch_single_market_async(mid) for mid in market_ids))
+            fetched = dict(zip(market_ids, results))
+        self.apply_ledger_updates(entries, fetched, now)
+
+    async def run_cycle_async(self):
+        request_deadline.set(time.monotonic() + GLOBAL_CONFIG.get("retry_deadline", 15))
+        if GLOBAL_CONFIG.get("scan_pipeline"): return await self.run_cycle_pipelined_async()
+        start_time = time.time()
+
+        if self.monitor_interval > 0:
+            markets = await timed_async("fetch_markets", self.fetch_markets_async())
+        elif GLOBAL_CONFIG.get("bet_refresh_mode", "scan") == "scan":
+            markets = await timed_async("fetch_markets", self.fetch_markets_async())
+            await timed_async("update_active_bets", self.update_active_bets_async(markets))
+        else:
+            # Wetten-Update und Markt-Scan laufen hier gleichzeitig im selben Loop
+            _, markets = await asyncio.gather(timed_async("update_active_bets", self.update_active_bets_async()),
+                                              timed_async("fetch_markets", self.fetch_markets_async()))
+
+        metrics.observe("polybot_phase_seconds", time.time() - start_time, phase="first_decision")
+        self.process_strategies(markets)
+
+        self.log_cycle(markets, time.time() - start_time)
+
+    async def run_cycle_pipelined_async(self):
+        start_time = time.time()
+        pipe = ScanPipeline(self, GLOBAL_CONFIG.get("bet_refresh_mode", "scan") == "scan", track_bets=self.monitor_interval <= 0)
+
+        if pipe.from_scan:
+            markets = await timed_async("fetch_markets", self.fetch_markets_async(on_page=pipe.feed))
+            with metrics.timer("polybot_phase_seconds", phase="update_active_bets"):
+                missing = pipe.missing()
+                found = await self.fetch_markets_by_ids_async(missing) if missing else {}
+                pipe.settle({mid: (m, "MARKT DEFEKT/GELÖSCHT") for mid, m in found.items()})
+        else:
+            async def refresh_bets():
+                market_ids = list(pipe.entries)
+                if not market_ids: return
+                results = await asyncio.gather(*(self.fetch_single_market_async(mid) for mid in market_ids))
+                pipe.settle(dict(zip(market_ids, results)))
+
+            # Strategien ohne offene Wetten kaufen schon, während die Einzel-GETs noch laufen
+            _, markets = await asyncio.gather(timed_async("update_active_bets", refresh_bets()),
+                                              timed_async("fetch_markets", self.fetch_markets_async(on_page=pipe.feed)))
+
+        pipe.finish()
+        self.log_cycle(markets, time.time() - start_time)
+
+    async def load_monitor_chunk_async(self, ids):
+        if len(ids) == 1 and GLOBAL_CONFIG.get("bet_refresh_mode", "scan") == "single":
+            return ids, {ids[0]: await self.fetch_single_market_async(ids[0])}
+        found = {str(m.get("id")): m for m in await self.load_ids_async(ids) or []}
+        return ids, {mid: (found.get(mid), "MARKT DEFEKT/GELÖSCHT") for mid in ids}
+
+    async def monitor_positions_async(self):
+        with metrics.timer("polybot_phase_seconds", phase="monitor"):
+            entries = self.ledger.rebuild(self.strategies)
+            request_deadline.set(time.monotonic() + self.monitor_interval) # Eigener Kontext des Monitor-Tasks
+            save_needed, pending = False, len(entries)
+            # In Prioritätsreihenfolge angelegt; die Semaphore lässt Wartende in dieser Reihenfolge durch
+            tasks = [asyncio.ensure_future(self.load_monitor_chunk_async(ids)) for ids in self.monitor_chunks(entries)]
+            try:
+                for coro in asyncio.as_completed(tasks, timeout=self.monitor_interval):
+                    ids, fetched = await coro
+                    if self.apply_monitor_chunk(entries, ids, fetched): save_needed = True
+                    pending -= len(ids)
+            except asyncio.TimeoutError:
+                for t in tasks: t.cancel()
+            metrics.set("polybot_monitor_deferred_markets", pending)
+            if save_needed: self.persist()
+
+    async def monitor_loop_async(self):
+        schedule = FixedRate("monitor", lambda: self.monitor_interval)
+        while True:
+            schedule.begin()
+            try:
+                await self.monitor_positions_async()
             except Exception as e:
-                sys_log(f"Fehler im Loop: {e}")
-            time.sleep(GLOBAL_CONFIG["check_interval"])
+                sys_log(f"Fehler im Monitor: {e}")
+            await asyncio.sleep(schedule.delay())
+
+    async def main_async(self):
+        concurrency = GLOBAL_CONFIG.get("async_concurrency", 100)
+        self.governor = RequestGovernor(GLOBAL_CONFIG.get("api_rate_limit", 0), concurrency)
+        self.scan_sem = asyncio.Semaphore(concurrency)
+        self.bet_sem = asyncio.Semaphore(concurrency)
+        connector, traces = make_connector(concurrency * 2)
+        headers = {"User-Agent": "Mozilla/5.0", "Accept-Encoding": ACCEPT_ENCODING}
+        async with aiohttp.ClientSession(headers=headers, connector=connector, trace_configs=traces) as client:
+            self.client = client
+            self.monitor_interval = GLOBAL_CONFIG.get("monitor_interval", 0)
+            monitor = None
+            if self.monitor_interval > 0:
+                sys_log(f"Monitor-Takt für offene Wetten: {self.monitor_interval}s, Markt-Scan: {GLOBAL_CONFIG['check_interval']}s.")
+                monitor = asyncio.ensure_future(self.monitor_loop_async()) # Referenz halten, sonst kann der Task eingesammelt werden
+
+            schedule = FixedRate("discovery", lambda: GLOBAL_CONFIG["check_interval"])
+            while True:
+                schedule.begin()
+                try:
+                    with profiler.track("engine"): await self.run_cycle_async()
+                except Exception as e:
+                    sys_log(f"Fehler im Loop: {e}")
+                await asyncio.sleep(schedule.delay())
+
+    def run(self):
+        self.startup()
+        self.start_price_feed()
+        asyncio.run(self.main_async())
+
+# --- PREIS-FEED (Websocket) ---
+class PriceFeed:
+    """Websocket-Client für den Markt-Kanal: Preis-Ticks gehen sofort auf die offenen Wetten (Stop-Loss je Tick).
+    Läuft in einem eigenen Thread mit eigenem Event-Loop; das Polling läuft unverändert weiter und trägt allein, solange der Stream weg ist."""
+    def __init__(self, engine, url, ping_every=10, stale_after=30):
+        self.engine = engine
+        self.url = url
+        self.ping_every = ping_every
+        self.stale_after = stale_after # Sekunden ohne Nachricht -> Verbindung gilt als tot
+        self.routes = {} # Token-ID -> (LedgerEntry, Outcome) der offenen Wetten
+        self.subscribed = frozenset()
+        self.dirty = False
+
+    def start(self):
+        threading.Thread(target=lambda: asyncio.run(self.main()), daemon=True).start()
+
+    def wanted(self):
+        """Token der Outcomes, auf die offene Wetten laufen (bekannt nach dem ersten Poll des Markts)"""
+        routes = {}
+        for entry in list(self.engine.ledger.entries.values()):
+            held = {bet["picked_outcome"] for _, bet in entry.positions}
+            for token, outcome in entry.tokens.items():
+                if outcome in held: routes[token] = (entry, outcome)
+        self.routes = routes
+        return frozenset(routes)
+
+    async def main(self):
+        backoff, connected = 1, False
+        while True:
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(self.url, timeout=10) as ws:
+                        sys_log("📡 Preis-Feed verbunden.")
+                        metrics.set("polybot_price_feed_connected", 1)
+                        backoff, connected = 1, True
+                        self.subscribed = frozenset() # Nach jedem Reconnect neu abonnieren
+                        await self.pump(ws)
+            except Exception as e:
+                if GLOBAL_CONFIG.get("debug"): sys_log(f"DEBUG Preis-Feed: {e!r}")
+            metrics.set("polybot_price_feed_connected", 0)
+            if connected:
+                sys_log("⚠️ Preis-Feed getrennt – Polling übernimmt bis zum Reconnect.")
+                metrics.inc("polybot_price_feed_reconnects_total")
+                connected = False
+            # Exponentielles Backoff mit Jitter, max. 30s
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+            backoff = min(backoff * 2, 30)
+
+    async def pump(self, ws):
+        last_msg = last_ping = last_publish = time.monotonic()
+        last_sub = 0.0
+        while True:
+            now = time.monotonic()
+            if now - last_sub >= 1.0:
+                # Neue/geschlossene Wetten: Abo höchstens 1x pro Sekunde abgleichen
+                tokens, last_sub = self.wanted(), now
+                if tokens != self.subscribed:
+                    await ws.send_json({"type": "market", "assets_ids": sorted(tokens)})
+                    self.subscribed = tokens
+            if now - last_ping >= self.ping_every:
+                await ws.send_str("PING")
+                last_ping = now
+            if now - last_msg > self.stale_after:
+                raise ConnectionError("keine Nachrichten mehr")
+            if self.dirty and now - last_publish >= 1.0:
+                # Reine Preisänderungen: Dashboard höchstens 1x pro Sekunde neu veröffentlichen
+                publish_dashboard()
+                self.dirty, last_publish = False, now
+
+            try:
+                msg = await ws.receive(timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                last_msg = time.monotonic()
+                self.handle(msg.data)
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.ERROR):
+                raise ConnectionError(f"Websocket {msg.type.name}")
+
+    def handle(self, data):
+        if data == "PONG": return
+        try: events = json.loads(data)
+        except ValueError: return
+        for ev in events if isinstance(events, list) else [events]:
+            kind = ev.get("event_type")
+            if kind == "price_change":
+                for ch in ev.get("price_changes") or []:
+                    # price ist das geänderte Orderbuch-Level; Marktpreis = Mitte aus best_bid/best_ask
+                    if ch.get("best_bid") is not None and ch.get("best_ask") is not None:
+                        self.tick(ch.get("asset_id"), round((float(ch["best_bid"]) + float(ch["best_ask"])) / 2, 4))
+            elif kind == "last_trade_price":
+                self.tick(ev.get("asset_id"), float(ev["price"]))
+
+    def tick(self, token, price):
+        route = self.routes.get(token)
+        if route is None: return
+        with metrics.timer("polybot_phase_seconds", phase="price_tick"):
+            self.engine.apply_price_tick(route[0], route[1], price)
+        metrics.inc("polybot_price_ticks_total")
+        self.dirty = True
+
+def create_engine():
+    """Wählt die Engine anhand von GLOBAL_CONFIG['engine_mode']"""
+    if GLOBAL_CONFIG.get("engine_mode") == "async":
+        if aiohttp is not None: return AsyncEngine()
+        sys_log("⚠️ engine_mode 'async' benötigt aiohttp (pip install aiohttp) – nutze Thread-Engine.")
+    return Engine()
+
+# --- SYNTHETISCHE MÄRKTE ---
+SYNTHETIC_TAGS = [[], ["Crypto"], ["Sports", "NBA"], ["Sports", "Soccer"], ["Politics"], ["Pop Culture"]]
+
+class SyntheticMarkets:
+    """Erzeugt Gamma-ähnliche Märkte mit Preisbewegung und Auflösung (für Replays, ohne Netzwerk)"""
+    def __init__(self, n_markets=4000, seed=42, start=None, max_minutes=24 * 60, activity=0.2):
+        self.rng = random.Random(seed)
+        self.now = start or datetime.now(timezone.utc)
+        self.max_minutes = max_minutes
+        self.activity = activity # Anteil der Märkte, deren Preis sich pro Schritt bewegt
+        self.next_id = 500000
+        self.open = {}
+        self.order = [] # (end, id) aufsteigend -> Scan-Reihenfolge, Abläufe stehen immer vorne
+        for _ in range(n_markets): self.spawn(initial=True)
+
+    def spawn(self, initial=False):
+        r = self.rng
+        mid = str(self.next_id)
+        self.next_id += 1
+        remaining = r.uniform(1, self.max_minutes) * 60
+        # Startbestand: Märkte laufen schon unterschiedlich lange, Restlaufzeit gleichverteilt
+        elapsed = r.uniform(0, self.max_minutes) * 60 if initial else 0
+        p0 = r.uniform(0.02, 0.98)
+        end = self.now + timedelta(seconds=remaining)
+        st = {
+            "id": mid, "end": end, "start_ts": self.now.timestamp() - elapsed, "duration": elapsed + remaining,
+            "p0": p0, "price": round(p0, 3), "noise": 0.0, "winner": r.random() < p0,
+            "base": {
+                "id": mid, "question": f"Synthetischer Markt #{mid}", "slug": f"synthetic-{mid}",
+                "outcomes": '["Yes", "No"]', "endDate": end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "tags": r.choice(SYNTHETIC_TAGS), "spread": r.choice([0.001, 0.01, 0.02, 0.04, 0.08]),
+                "liquidity": round(r.lognormvariate(8.5, 1.2), 2), "active": True,
+                "clobTokenIds": f'["{mid}01", "{mid}02"]'
+            }
+        }
+        st["payload"] = self.payload(st)
+        self.open[mid] = st
+        bisect.insort(self.order, (end, mid))
+
+    def payload(self, st, closed=False):
+        p = (1.0 if st["winner"] else 0.0) if closed else st["price"]
+        return dict(st["base"], outcomePrices=f'["{p:.3f}", "{1 - p:.3f}"]', closed=closed)
+
+    def advance(self, seconds):
+        """Simulationszeit vorstellen; liefert die dabei aufgelösten Märkte (closed=True)"""
+        self.now += timedelta(seconds=seconds)
+        r, scale = self.rng, 0.02 * math.sqrt(seconds / 60.0)
+
+        # Abgelaufene Märkte stehen vorne in der Reihenfolge
+        expired = bisect.bisect_right(self.order, (self.now, "\uffff"))
+        closed = [self.payload(self.open.pop(mid), closed=True) for _, mid in self.order[:expired]]
+        del self.order[:expired]
+
+        # Nur ein Teil der Märkte handelt pro Schritt
+        moving = r.sample(self.order, int(len(self.order) * self.activity))
+        now_ts = self.now.timestamp()
+        for _, mid in moving:
+            st = self.open[mid]
+            # Preis läuft mit wachsendem Fortschritt Richtung Ergebnis, plus abklingendes Rauschen
+            progress = (now_ts - st["start_ts"]) / st["duration"]
+            st["noise"] = st["noise"] * 0.9 + r.gauss(0, scale)
+            target = 1.0 if st["winner"] else 0.0
+            price = min(0.999, max(0.001, round(st["p0"] + (target - st["p0"]) * progress ** 3 + st["noise"], 3)))
+            if price != st["price"]:
+                st["price"] = price
+                st["payload"] = self.payload(st)
+        for _ in closed: self.spawn()
+        return closed
+
+    def snapshot(self):
+        """Offene Märkte wie /markets?closed=false&order=endDate&ascending=true"""
+        return [self.open[mid]["payload"] for _, mid in self.order]
+
+def synthetic_snapshots(n_markets=4000, steps=2880, interval=30, seed=42, start=None):
+    """Erzeugt (ts, Art, Märkte) wie der Recorder: aufgelöste Märkte ("bets") und Scan je Schritt"""
+    sim = SyntheticMarkets(n_markets, seed, start)
+    for _ in range(steps):
+        closed = sim.advance(interval)
+        ts = sim.now.timestamp()
+        if closed: yield ts, "bets", closed
+        yield ts, "scan", sim.snapshot()
+
+# --- BACKTEST / REPLAY ---
+class ReplayStrategy(Strategy):
+    """Strategie-Kopie für Replays: Logs mit Simulationszeit und ohne System-Log"""
+    def log(self, msg):
+        entry = f"[{self._engine.local_now().strftime('%H:%M:%S')}] {msg}"
+        self.logs.insert(0, entry)
+        if len(self.logs) > 100: self.logs.pop()
+
+    @classmethod
+    def from_config(cls, data):
+        cfg = {k: v for k, v in data.items() if k not in ("active_bets", "history", "logs")}
+        cfg.update(active_bets=[], history=[], logs=[], wins=0, losses=0, is_running=True)
+        cfg["initial_balance"] = cfg.get("initial_balance", cfg.get("balance", 1000.0))
+        cfg["balance"] = cfg["initial_balance"]
+        return cls(cfg)
+
+class ReplayEngine(Engine):
+    """Spielt Snapshots durch dieselbe Kauf-, Stop-Loss- und Auflösungslogik wie live (Simulationsuhr, kein Netzwerk)"""
+    mode = "replay"
+
+    def __init__(self, strategy_map):
+        self.sim_now = None
+        super().__init__(clock=lambda: self.sim_now, strategy_map=strategy_map)
+        self.recorder.enabled = False
+        self.known = {} # market_id -> zuletzt gesehener Markt (ersetzt GET /markets/{id})
+        self.steps = 0
+        for strat in strategy_map.values(): strat._engine = self
+
+    def persist(self):
+        pass
+
+    def fetch_markets_by_ids(self, market_ids):
+        return {mid: self.known[mid] for mid in market_ids if mid in self.known}
+
+    def fetch_single_market(self, market_id):
+        m = self.known.get(str(market_id))
+        return (m, None) if m is not None else (None, "MARKT DEFEKT/GELÖSCHT")
+
+    def split_scan_hits(self, market_ids, scan_markets):
+        # known enthält den aktuellen Scan bereits
+        return self.known, [mid for mid in market_ids if mid not in self.known]
+
+    def visible_markets(self, markets):
+        """Wie live mit fetch_horizon: nur der Scan-Anfang bis zum Horizont (Snapshots sind nach endDate sortiert)"""
+        horizon = self.make_fetch_plan().horizon_end
+        return markets if horizon is None else markets_until(markets, horizon)
+
+    def step(self, ts, kind, markets):
+        self.sim_now = datetime.fromtimestamp(ts, timezone.utc)
+        for m in markets: self.known[str(m.get("id"))] = m
+        if kind == "scan":
+            markets = self.visible_markets(markets)
+            self.update_active_bets(markets)
+            self.process_strategies(markets)
+        else:
+            # Wetten-Update aus dem Recorder: nur offene Positionen aktualisieren
+            self.update_active_bets([])
+        self.steps += 1
+
+    def run_replay(self, snapshots):
+        first = last = None
+        for ts, kind, markets in snapshots:
+            if first is None: first = ts
+            last = ts
+            self.step(ts, kind, markets)
+        return {"steps": self.steps, "sim_seconds": (last - first) if first is not None else 0, "strategies": self.results()}
+
+    def results(self):
+        """Kennzahlen je Strategie, wie sie das Dashboard zeigt"""
+        out = {}
+        for s_id, s in self.strategies.items():
+            out[s_id] = {
+                "name": s.name, "equity": s.get_equity(), "balance": s.balance,
+                "initial_balance": s.initial_balance, "wins": s.wins, "losses": s.losses,
+                "open_bets": len(s.active_bets), "history": s.history
+            }
+        return out
+
+def cli_time_range(args):
+    start = datetime.fromisoformat(args.start).timestamp() if args.start else None
+    end = datetime.fromisoformat(args.end).timestamp() if args.end else None
+    return start, end
+
+def replay_main(args):
+    """CLI: python polybot.py replay ..."""
+    if args.synthetic:
+        snapshots = synthetic_snapshots(args.markets, args.steps, args.interval, args.seed)
+    else:
+        snapshots = SnapshotReader(args.recordings).snapshots(*cli_time_range(args))
+
+    # Nur lesen: das Replay darf die Daten des laufenden Bots weder anlegen noch migrieren
+    source = read_strategy_configs() or {"default": dict(DEFAULT_STRATEGY_CONFIG, id="default", name="Standard")}
+    replay = ReplayEngine({s_id: ReplayStrategy.from_config(d) for s_id, d in source.items()})
+
+    t0 = time.time()
+    res = replay.run_replay(snapshots)
+    wall = time.time() - t0
+
+    print(f"Replay: {res['steps']} Snapshots, {res['sim_seconds'] / 3600:.1f}h simuliert in {wall:.1f}s ({res['sim_seconds'] / max(wall, 1e-9):.0f}x Echtzeit)")
+    for r in sorted(res["strategies"].values(), key=lambda r: -r["equity"]):
+        print(f"  {r['name'][:30]:30} Equity ${r['equity']:>10.2f} | Cash ${r['balance']:>10.2f} | S/N {r['wins']}/{r['losses']} | Offen {r['open_bets']}")
+    if args.json:
+        with open(args.json, "w") as f: json.dump(res, f, indent=2)
+        print(f"Ergebnis gespeichert: {args.json}")
+
+# --- PARAMETER SWEEP ---
+SWEEP_PARAMS = {
+    "min_prob": float, "max_prob": float, "max_time_min": int, "min_liquidity": float,
+    "max_spread": float, "stop_loss_trigger": float, "bet_percentage": float
+}
+
+def parse_sweep_values(text, cast):
+    """'0.85:0.95:0.05' (Start:Ende:Schritt, inkl. Ende) oder '15,30,60'"""
+    if ":" in text:
+        start, end, step = (float(x) for x in text.split(":"))
+        count = int(round((end - start) / step)) + 1
+        return [cast(round(start + i * step, 6)) for i in range(max(count, 1))]
+    return [cast(x) for x in text.split(",") if x.strip()]
+
+def sweep_grid(ranges):
+    """Alle Kombinationen (ohne unsinnige mit min_prob > max_prob)"""
+    keys = list(ranges)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(ranges[k] for k in keys))]
+    return [c for c in combos if c["min_prob"] <= c["max_prob"]]
+
+_sweep_source = None # (Verzeichnis, Start, Ende, Horizont) des Datensatzes, je Worker-Prozess
+
+def sweep_worker_init(directory, start, end, horizon_min):
+    global _sweep_source
+    _sweep_source = (directory, start, end, horizon_min)
+
+def sweep_snapshots(directory, start, end, horizon_min):
+    """Snapshots direkt aus den memory-mapped Aufzeichnungen, einzeln dekodiert: Speicher pro Worker ~ ein Snapshot
+    statt des ganzen Datensatzes, dafür dekodiert jeder Block neu (größeres --chunk verteilt das auf mehr Kombinationen)"""
+    for ts, kind, markets in SnapshotReader(directory).snapshots(start, end):
+        if kind == "scan" and horizon_min is not None:
+            # Alles hinter dem größten Horizont des Grids kann keine Strategie kaufen
+            markets = markets_until(markets, datetime.fromtimestamp(ts, timezone.utc) + timedelta(minutes=horizon_min))
+        yield ts, kind, markets
+
+def sweep_worker(task):
+    """Ein Replay über den gemeinsamen Datensatz für einen Block von Parameter-Kombinationen"""
+    combos, balance = task
+    strats = {}
+    for i, combo in enumerate(combos):
+        cfg = dict(DEFAULT_STRATEGY_CONFIG, id=f"s{i}", name=f"s{i}", balance=balance, category_filter="")
+        cfg.update(combo)
+        strats[cfg["id"]] = ReplayStrategy.from_config(cfg)
+    res = ReplayEngine(strats).run_replay(sweep_snapshots(*_sweep_source))["strategies"]
+    out = []
+    for i, combo in enumerate(combos):
+        r = res[f"s{i}"]
+        out.append(dict(combo, equity=r["equity"], roi=(r["equity"] / r["initial_balance"] - 1) * 100,
+                        wins=r["wins"], losses=r["losses"], open_bets=r["open_bets"]))
+    return out
+
+def sweep_main(args):
+    """CLI: python polybot.py sweep ..."""
+    ranges = {}
+    for key, cast in SWEEP_PARAMS.items():
+        text = getattr(args, key)
+        ranges[key] = parse_sweep_values(text, cast) if text else [cast(DEFAULT_STRATEGY_CONFIG[key])]
+    combos = sweep_grid(ranges)
+    if not combos:
+        print("Keine gültigen Kombinationen.")
+        return
+
+    directory, start, end, tmp = args.recordings, *cli_time_range(args), None
+    if args.synthetic:
+        # Synthetische Daten 1x auf Disk schreiben, Worker streamen sie per mmap statt gepickelt
+        tmp = tempfile.mkdtemp(prefix="polybot-sweep-")
+        write_snapshots(tmp, synthetic_snapshots(args.markets, args.steps, args.interval, args.seed))
+        directory = tmp
+    elif not SnapshotReader(directory).files(start, end):
+        # Ohne Snapshots liefe jede Kombination leer durch und die Rangliste wäre bedeutungslos
+        sys.exit(f"Keine Aufzeichnungen in {directory} für den gewählten Zeitraum.")
+
+    horizon = max(ranges["max_time_min"]) + 2 if GLOBAL_CONFIG.get("fetch_horizon", True) else None
+    tasks = [(combos[i:i + args.chunk], args.balance) for i in range(0, len(combos), args.chunk)]
+    workers = args.workers or os.cpu_count() or 1
+    print(f"Sweep: {len(combos)} Kombinationen in {len(tasks)} Blöcken auf {workers} Prozessen...")
+
+    t0 = time.time()
+    rows = []
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=sweep_worker_init,
+                                                    initargs=(directory, start, end, horizon)) as ex:
+            for done, part in enumerate(ex.map(sweep_worker, tasks), 1):
+                rows.extend(part)
+                print(f"  {done}/{len(tasks)} Blöcke fertig ({time.time() - t0:.0f}s)")
+    finally:
+        if tmp: shutil.rmtree(tmp, ignore_errors=True)
+
+    rows.sort(key=lambda r: -r["equity"])
+    cols = list(SWEEP_PARAMS) + ["equity", "roi", "wins", "losses", "open_bets"]
+    print(f"Fertig in {time.time() - t0:.1f}s. Top {min(args.top, len(rows))}:")
+    width = {c: max(12, len(c)) for c in cols}
+    print("  " + " | ".join(f"{c:>{width[c]}}" for c in cols))
+    for r in rows[:args.top]:
+        print("  " + " | ".join(f"{r[c]:>{width[c]}.4g}" if isinstance(r[c], float) else f"{r[c]:>{width[c]}}" for c in cols))
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=cols)
+            w.writeheader()
+            w.writerows(rows)
+        print(f"Rangliste gespeichert: {args.csv}")
+
+# --- BENCHMARK ---
+class BenchEngine(ReplayEngine):
+    """Replay-Engine, die Wetten wie live gegen den Scan abgleicht; aufgelöste Märkte kommen aus known"""
+    mode = "bench"
+    split_scan_hits = Engine.split_scan_hits
+
+def percentile(values, q):
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def latency_stats(values):
+    return {"p50": percentile(values, 50), "p90": percentile(values, 90), "p99": percentile(values, 99),
+            "max": max(values) if values else None, "mean": sum(values) / len(values) if values else None}
+
+def bench_case(n_markets, n_strategies, n_bets, cycles=10, warmup=1, interval=30, seed=42, storage="sqlite"):
+    """Ein Benchmark-Fall (läuft in einem eigenen Prozess, damit der Peak-RSS nur diesen Fall misst)"""
+    global strategies, store, DATA_FILE
+    rng = random.Random(seed)
+    sim = SyntheticMarkets(n_markets, seed)
+    strats = {}
+    for i in range(n_strategies):
+        cfg = dict(DEFAULT_STRATEGY_CONFIG, id=f"b{i}", name=f"b{i}", category_filter=rng.choice(["", "", "crypto", "sports"]),
+                   min_prob=rng.choice([0.5, 0.8, 0.9]), max_prob=rng.choice([0.95, 0.98, 0.99]),
+                   max_time_min=rng.choice([15, 60, 240, 1440]), min_liquidity=rng.choice([0, 1000, 5000]),
+                   max_spread=rng.choice([0.02, 0.05, 0.1]))
+        strats[cfg["id"]] = ReplayStrategy.from_config(cfg)
+    engine = BenchEngine(strats)
+    engine.sim_now = sim.now
+
+    # Offene Wetten auf zufällige Märkte verteilen (wie von process_strategies angelegt)
+    markets = sim.snapshot()
+    ids = list(strats)
+    for k in range(n_bets if ids else 0):
+        m = rng.choice(markets)
+        strats[ids[k % len(ids)]].active_bets.append({
+            "market_id": m["id"], "slug": m["slug"], "title": m["question"], "picked_outcome": "Yes",
+            "entry_price": 0.5, "current_price": 0.5, "amount": 10.0, "time_str": "", "minutes_left": 0, "fail_count": 0})
+
+    # Echter save_data()-Pfad (inkl. publish_dashboard) gegen die Bench-Strategien und einen temporären Speicher
+    tmp = tempfile.mkdtemp(prefix="polybot-bench-")
+    live = strategies, store, DATA_FILE, GLOBAL_CONFIG.get("storage_backend", "sqlite")
+    strategies, DATA_FILE = strats, os.path.join(tmp, "bench.json")
+    store = SqliteStore(os.path.join(tmp, "bench.db")) if storage == "sqlite" else None
+    GLOBAL_CONFIG["storage_backend"] = storage
+    def save():
+        save_data()
+        flush_data() # Schreibzeit des Hintergrund-Writers mitmessen
+
+    phases = {"update_active_bets": [], "process_strategies": [], "save_data": [], "cycle": []}
+    try:
+        for c in range(warmup + cycles):
+            closed = sim.advance(interval)
+            engine.sim_now = sim.now
+            for m in closed: engine.known[m["id"]] = m
+            # Neue dict-Objekte wie nach r.json(), sonst greift der Identitäts-Fastpath des Markt-Caches immer
+            scan = [dict(m) for m in sim.snapshot()]
+
+            t0 = time.perf_counter()
+            engine.update_active_bets(scan)
+            t1 = time.perf_counter()
+            engine.process_strategies(scan)
+            t2 = time.perf_counter()
+            save()
+            t3 = time.perf_counter()
+            if c < warmup: continue
+            phases["update_active_bets"].append(t1 - t0)
+            phases["process_strategies"].append(t2 - t1)
+            phases["save_data"].append(t3 - t2)
+            phases["cycle"].append(t3 - t0)
+    finally:
+        strategies, store, DATA_FILE, GLOBAL_CONFIG["storage_backend"] = live
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    total = sum(phases["cycle"])
+    evaluate = sum(phases["process_strategies"])
+    peak = None
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024 # macOS: Bytes, sonst KB
+    return {
+        "markets": n_markets, "strategies": n_strategies, "open_bets": n_bets, "cycles": cycles,
+        "open_bets_end": sum(len(s.active_bets) for s in strats.values()),
+        "markets_per_s": n_markets * cycles / total if total else None,
+        "evaluations_per_s": n_markets * n_strategies * cycles / evaluate if evaluate else None,
+        "latency_s": {phase: latency_stats(values) for phase, values in phases.items()},
+        "peak_rss_mb": round(peak, 1) if peak is not None else None
+    }
+
+def bench_main(args):
+    """CLI: python polybot.py bench ..."""
+    grid = list(itertools.product(parse_sweep_values(args.markets, int), parse_sweep_values(args.strategies, int),
+                                  parse_sweep_values(args.open_bets, int)))
+    print(f"Benchmark: {len(grid)} Fälle à {args.cycles} Zyklen (+{args.warmup} Warmup), Speicher: {args.storage}")
+    results = []
+    for n_markets, n_strategies, n_bets in grid:
+        # Jeder Fall in einem frischen Prozess: unabhängiger Peak-RSS, keine Caches aus vorherigen Fällen
+        with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+            res = pool.apply(bench_case, (n_markets, n_strategies, n_bets, args.cycles, args.warmup, args.interval, args.seed, args.storage))
+        results.append(res)
+        lat = res["latency_s"]
+        print(f"  {n_markets:>6} Märkte | {n_strategies:>5} Strategien | {n_bets:>6} Wetten | "
+              f"Zyklus p50 {lat['cycle']['p50'] * 1000:8.1f}ms p99 {lat['cycle']['p99'] * 1000:8.1f}ms | "
+              f"Wetten {lat['update_active_bets']['p50'] * 1000:7.1f}ms | Strategien {lat['process_strategies']['p50'] * 1000:7.1f}ms | "
+              f"Speichern {lat['save_data']['p50'] * 1000:7.1f}ms | {res['markets_per_s']:,.0f} Märkte/s | Peak {res['peak_rss_mb']} MB")
+
+    if args.json:
+        meta = {"timestamp": datetime.now(timezone.utc).isoformat(), "python": platform.python_version(),
+                "platform": platform.platform(), "cpus": os.cpu_count(), "numpy": np.__version__ if np is not None else None,
+                "cycles": args.cycles, "warmup": args.warmup, "interval": args.interval, "seed": args.seed, "storage": args.storage}
+        with open(args.json, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Ergebnis gespeichert: {args.json}")
+
+# --- GAMMA STAND-IN (Lasttests ohne Produktion) ---
+GAMMA_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+def parse_gamma_time(text):
+    try: return datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except (AttributeError, ValueError): return None
+
+class SyntheticSource:
+    """Synthetische Märkte, die mit der Wanduhr weiterlaufen"""
+    def __init__(self, n_markets=4000, seed=42, interval=30):
+        self.sim = SyntheticMarkets(n_markets, seed)
+        self.interval = interval
+        self.fresh = True
+
+    def advance(self, now):
+        """Bis now vorspulen; liefert (neuer Scan oder None, aufgelöste Märkte)"""
+        closed, steps = [], 0
+        while self.sim.now + timedelta(seconds=self.interval) <= now:
+            closed.extend(self.sim.advance(self.interval))
+            steps += 1
+        if not (steps or self.fresh): return None, closed
+        self.fresh = False
+        return self.sim.snapshot(), closed
+
+class RecordedSource:
+    """Aufzeichnungen in Echtzeit abgespielt; endDates werden auf die Wanduhr verschoben"""
+    def __init__(self, directory, start=None, end=None):
+        self.snapshots = SnapshotReader(directory).snapshots(start, end)
+        self.pending = next(self.snapshots, None)
+        if self.pending is None: raise ValueError(f"Keine Aufzeichnungen in {directory}")
+        self.offset = time.time() - self.pending[0]
+
+    def shift(self, m):
+        end = parse_gamma_time(m.get("endDate"))
+        if end is None: return m
+        return dict(m, endDate=(end + timedelta(seconds=self.offset)).strftime(GAMMA_TIME_FORMAT))
+
+    def advance(self, now):
+        # Nach dem letzten Snapshot bleibt der letzte Scan stehen
+        scan, closed = None, []
+        while self.pending is not None and self.pending[0] + self.offset <= now.timestamp():
+            ts, kind, markets = self.pending
+            if kind == "scan": scan = markets
+            else: closed.extend(m for m in markets if m.get("closed"))
+            self.pending = next(self.snapshots, None)
+        return ([self.shift(m) for m in scan] if scan is not None else None), [self.shift(m) for m in closed]
+
+class GammaStandIn:
+    """Lokaler Ersatz für /markets und /markets/{id} mit einstellbaren Fehlern (Latenz, 429/5xx, Timeouts, Löschungen)"""
+    def __init__(self, source, latency=0.0, jitter=0.0, rate_429=0.0, rate_5xx=0.0, timeout_rate=0.0, timeout=15.0, delete_rate=0.0, seed=42, max_closed=50000):
+        self.source = source
+        self.rng = random.Random(seed)
+        self.latency, self.jitter = latency, jitter
+        self.rate_429, self.rate_5xx = rate_429, rate_5xx
+        self.timeout_rate, self.timeout = timeout_rate, timeout
+        self.delete_rate = delete_rate # Anteil offener Märkte, die pro Scan-Schritt gelöscht werden
+        self.max_closed = max_closed
+        self.view = ([], [], {}) # (offene Märkte nach endDate, endDates für bisect, id -> Markt), wird nur ersetzt
+        self.closed = {}
+        self.deleted = set()
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+        self.refresh()
+
+    def count(self, key):
+        with self.stats_lock: self.stats[key] = self.stats.get(key, 0) + 1
+
+    def refresh(self):
+        scan, closed = self.source.advance(datetime.now(timezone.utc))
+        for m in closed: self.closed[str(m.get("id"))] = m
+        while len(self.closed) > self.max_closed: del self.closed[next(iter(self.closed))]
+        if scan is None: return
+        if self.delete_rate:
+            for m in scan:
+                if self.rng.random() < self.delete_rate: self.deleted.add(str(m.get("id")))
+        markets = [m for m in scan if str(m.get("id")) not in self.deleted]
+        self.view = (markets, [m.get("endDate") or "" for m in markets], {str(m.get("id")): m for m in markets})
+
+    def loop(self, every=1.0):
+        while True:
+            time.sleep(every)
+            try: self.refresh()
+            except Exception as e: print(f"Stand-in: Fehler beim Aktualisieren: {e!r}")
+
+    def lookup(self, mid):
+        if mid in self.deleted: return None
+        return self.view[2].get(mid) or self.closed.get(mid)
+
+    def fault(self):
+        """Latenz und zufällige Fehler vor jeder Antwort; liefert eine Fehlerantwort oder None"""
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        if delay: time.sleep(delay)
+        roll = self.rng.random()
+        if roll < self.timeout_rate:
+            # Antwortet erst nach dem Client-Timeout
+            self.count("timeout")
+            time.sleep(self.timeout)
+            return Response("Gateway Timeout", 504)
+        roll -= self.timeout_rate
+        if roll < self.rate_429:
+            self.count("429")
+            return Response("Too Many Requests", 429, {"Retry-After": "1"})
+        roll -= self.rate_429
+        if roll < self.rate_5xx:
+            status = self.rng.choice([500, 502, 503])
+            self.count(str(status))
+            return Response("Server Error", status)
+        return None
+
+    def list_markets(self, args):
+        """/markets: active, closed, order=endDate, ascending, end_date_min/max, id, limit, offset"""
+        ids = args.getlist("id")
+        if ids:
+            rows = [m for m in map(self.lookup, ids) if m is not None]
+        elif args.get("active") == "false":
+            rows = [] # Synthetische und aufgezeichnete offene Märkte sind alle aktiv
+        elif args.get("closed") == "true":
+            rows = [m for mid, m in self.closed.items() if mid not in self.deleted]
+        else:
+            markets, ends, _ = self.view
+            lo, hi = 0, len(markets)
+            t = parse_gamma_time(args.get("end_date_min"))
+            if t is not None: lo = bisect.bisect_left(ends, t.strftime(GAMMA_TIME_FORMAT))
+            t = parse_gamma_time(args.get("end_date_max"))
+            if t is not None: hi = bisect.bisect_right(ends, t.strftime(GAMMA_TIME_FORMAT))
+            rows = markets[lo:hi]
+        if args.get("ascending") == "false": rows = rows[::-1]
+        offset = int(args.get("offset") or 0)
+        return rows[offset:offset + int(args.get("limit") or 100)]
+
+    def create_app(self):
+        gamma = Flask(__name__)
+
+        @gamma.route("/markets")
+        def markets():
+            error = self.fault()
+            if error is not None: return error
+            self.count("markets")
+            return jsonify(self.list_markets(request.args))
+
+        @gamma.route("/markets/<mid>")
+        def market(mid):
+            error = self.fault()
+            if error is not None: return error
+            m = self.lookup(mid)
+            if m is None:
+                self.count("404")
+                return jsonify({"type": "not found", "error": "id not found"}), 404
+            self.count("market")
+            return jsonify(m)
+
+        @gamma.route("/stats")
+        def stats():
+            with self.stats_lock: out = dict(self.stats)
+            markets, _, _ = self.view
+            out.update(open_markets=len(markets), closed_markets=len(self.closed), deleted_markets=len(self.deleted))
+            return jsonify(out)
+
+        @gamma.after_request
+        def compress(response):
+            # Wie die echte API: gzip, wenn der Client es anbietet (Stufe 1, damit der Stand-in nicht zum Flaschenhals wird)
+            if "gzip" in request.headers.get("Accept-Encoding", "") and response.mimetype == "application/json":
+                z = zlib.compressobj(1, zlib.DEFLATED, 31)
+                response.set_data(z.compress(response.get_data()) + z.flush())
+                response.headers["Content-Encoding"] = "gzip"
+                response.headers["Vary"] = "Accept-Encoding"
+            return response
+
+        return gamma
+
+class PriceFeedStandIn:
+    """Websocket-Ersatz für den Markt-Kanal: price_change Events für abonnierte Token, sobald sich Preise im Stand-in ändern"""
+    def __init__(self, standin, drop_rate=0.0, seed=42):
+        self.standin = standin
+        self.drop_rate = drop_rate # Wahrscheinlichkeit pro Sekunde, dass eine Verbindung abreißt
+        self.rng = random.Random(seed)
+        self.clients = {} # Websocket -> {Token: zuletzt gesendeter Preis}
+        self.index = {} # Token -> (Markt-ID, Outcome-Index)
+        self.indexed = set()
+
+    def serve(self, host, port):
+        from aiohttp import web
+
+        async def handler(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            self.clients[ws] = {}
+            try:
+                async for msg in ws:
+                    if msg.type != aiohttp.WSMsgType.TEXT: continue
+                    if msg.data == "PING":
+                        await ws.send_str("PONG")
+                        continue
+                    try: sub = json.loads(msg.data)
+                    except ValueError: continue
+                    # Neues Abo: alle Token bekommen als Erstes ihren aktuellen Preis
+                    self.clients[ws] = {t: None for t in sub.get("assets_ids") or []}
+                    self.standin.count("ws_subscribe")
+            finally:
+                self.clients.pop(ws, None)
+            return ws
+
+        async def main():
+            feed = web.Application()
+            feed.router.add_get("/ws/market", handler)
+            runner = web.AppRunner(feed)
+            await runner.setup()
+            await web.TCPSite(runner, host, port).start()
+            await self.publish_loop()
+
+        threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+
+    def price(self, token, by_id):
+        if token not in self.index:
+            # Token-Index einmal pro Markt aufbauen
+            for mid, m in by_id.items():
+                if mid in self.indexed: continue
+                self.indexed.add(mid)
+                try:
+                    for i, t in enumerate(json.loads(m.get("clobTokenIds") or "[]")): self.index[t] = (mid, i)
+                except ValueError: pass
+        mid, i = self.index.get(token, (None, None))
+        m = by_id.get(mid)
+        if m is None: return None
+        try: return float(json.loads(m.get("outcomePrices") or "[]")[i])
+        except (ValueError, IndexError): return None
+
+    async def publish_loop(self, every=0.1):
+        while True:
+            await asyncio.sleep(every)
+            by_id = self.standin.view[2]
+            for ws, subs in list(self.clients.items()):
+                if self.drop_rate and self.rng.random() < self.drop_rate * every:
+                    self.standin.count("ws_drop")
+                    await ws.close()
+                    continue
+                changes = []
+                for token, last in subs.items():
+                    p = self.price(token, by_id)
+                    if p is None or p == last: continue
+                    subs[token] = p
+                    half = min(0.005, p, 1 - p)
+                    changes.append({"asset_id": token, "price": f"{p:.3f}", "best_bid": f"{p - half:.4f}", "best_ask": f"{p + half:.4f}"})
+                if changes:
+                    self.standin.count("ws_ticks")
+                    try: await ws.send_json({"event_type": "price_change", "price_changes": changes, "timestamp": str(int(time.time() * 1000))})
+                    except Exception: self.clients.pop(ws, None)
+
+def standin_main(args):
+    """CLI: python polybot.py gamma-standin ..."""
+    if args.synthetic:
+        source = SyntheticSource(args.markets, args.seed, args.interval)
+    else:
+        source = RecordedSource(args.recordings, *cli_time_range(args))
+    standin = GammaStandIn(source, args.latency / 1000, args.jitter / 1000, args.rate_429, args.rate_5xx,
+                           args.timeout_rate, args.timeout, args.delete_rate, args.seed)
+    threading.Thread(target=standin.loop, daemon=True).start()
+    print(f"Gamma Stand-in auf http://{args.host}:{args.port} ({len(standin.view[0])} offene Märkte)")
+    print(f"  Im Bot: \"api_base_url\": \"http://{args.host}:{args.port}\" in {CONFIG_FILE}; Zähler unter /stats")
+    if args.ws_port:
+        if aiohttp is None:
+            print("  Preis-Feed braucht aiohttp (pip install aiohttp) – nicht gestartet.")
+        else:
+            PriceFeedStandIn(standin, args.ws_drop_rate, args.seed).serve(args.host, args.ws_port)
+            print(f"  Preis-Feed: \"price_feed_url\": \"ws://{args.host}:{args.ws_port}/ws/market\"")
+    serve_keepalive(standin.create_app(), args.host, args.port)
+
+def serve_keepalive(app, host, port):
+    """Minimaler HTTP/1.1-Server mit Keep-Alive vor der Flask-App: der Flask-Dev-Server schließt nach jeder Antwort,
+    ein Lasttest würde dann nur den Verbindungsaufbau messen"""
+    client = app.test_client(use_cookies=False)
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            r = client.get(self.path, headers=dict(self.headers))
+            body = r.get_data()
+            self.send_response(r.status_code)
+            for k, v in r.headers.items():
+                if k.lower() != "content-length": self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(http.server.ThreadingHTTPServer):
+        request_queue_size = 256 # Standard 5 lässt parallele Verbindungsaufbauten des Async-Modus in SYN-Retries laufen
+
+    Server((host, port), Handler).serve_forever()
+
+def add_dataset_args(p):
+    p.add_argument("--recordings", default=GLOBAL_CONFIG.get("record_dir", "recordings"), help="Verzeichnis mit .pbr Aufzeichnungen")
+    p.add_argument("--from", dest="start", help="Start (ISO, z.B. 2026-01-01T00:00:00+00:00)")
+    p.add_argument("--to", dest="end", help="Ende (ISO)")
+    p.add_argument("--synthetic", action="store_true", help="Synthetische statt aufgezeichnete Märkte")
+    p.add_argument("--markets", type=int, default=4000, help="Synthetisch: Anzahl offener Märkte")
+    p.add_argument("--steps", type=int, default=2880, help="Synthetisch: Anzahl Scans")
+    p.add_argument("--interval", type=int, default=30, help="Synthetisch: Sekunden zwischen Scans")
+    p.add_argument("--seed", type=int, default=42)
+
+def build_cli():
+    parser = argparse.ArgumentParser(description="PolyBot Pro – Dashboard & Engine (ohne Argumente) oder Werkzeuge")
+    sub = parser.add_subparsers(dest="command")
+
+    rp = sub.add_parser("replay", help="Strategien gegen aufgezeichnete oder synthetische Snapshots laufen lassen")
+    add_dataset_args(rp)
+    rp.add_argument("--json", help="Ergebnis (inkl. Historie) als JSON speichern")
+
+    sw = sub.add_parser("sweep", help="Parameter-Grid parallel über alle Kerne testen")
+    add_dataset_args(sw)
+    for key in SWEEP_PARAMS:
+        sw.add_argument("--" + key.replace("_", "-"), dest=key, help="Werte als 'a,b,c' oder 'Start:Ende:Schritt'")
+    sw.add_argument("--balance", type=float, default=DEFAULT_STRATEGY_CONFIG["balance"], help="Startkapital je Kombination")
+    sw.add_argument("--workers", type=int, default=0, help="Prozesse (0 = alle Kerne)")
+    sw.add_argument("--chunk", type=int, default=200, help="Kombinationen pro Replay-Block")
+    sw.add_argument("--top", type=int, default=20, help="Anzahl angezeigter Plätze")
+    sw.add_argument("--csv", help="Komplette Rangliste als CSV speichern")
+
+    bp = sub.add_parser("bench", help="Engine-Hotpaths mit synthetischen Märkten messen")
+    bp.add_argument("--markets", default="1000,10000", help="Anzahl Märkte, z.B. '1000,10000,50000'")
+    bp.add_argument("--strategies", default="1,100", help="Anzahl Strategien, z.B. '1,100,1000'")
+    bp.add_argument("--open-bets", dest="open_bets", default="0,1000", help="Offene Wetten zu Beginn, z.B. '0,1000'")
+    bp.add_argument("--cycles", type=int, default=10, help="Gemessene Zyklen pro Fall")
+    bp.add_argument("--warmup", type=int, default=1, help="Ungemessene Zyklen vorab (kalter Markt-Cache)")
+    bp.add_argument("--interval", type=int, default=30, help="Simulierte Sekunden zwischen Zyklen")
+    bp.add_argument("--storage", choices=["sqlite", "json"], default=GLOBAL_CONFIG.get("storage_backend", "sqlite"))
+    bp.add_argument("--seed", type=int, default=42)
+    bp.add_argument("--json", help="Ergebnisse als JSON speichern (für Vergleiche zwischen Läufen)")
+
+    gp = sub.add_parser("gamma-standin", help="Lokaler Gamma-API-Ersatz mit synthetischen oder aufgezeichneten Märkten")
+    add_dataset_args(gp)
+    gp.add_argument("--host", default="127.0.0.1")
+    gp.add_argument("--port", type=int, default=8800)
+    gp.add_argument("--latency", type=float, default=0, help="Mittlere Zusatzlatenz je Request in ms")
+    gp.add_argument("--jitter", type=float, default=0, help="Latenz schwankt gleichverteilt um +/- jitter ms")
+    gp.add_argument("--rate-429", dest="rate_429", type=float, default=0, help="Anteil Requests mit 429 (Retry-After: 1)")
+    gp.add_argument("--rate-5xx", dest="rate_5xx", type=float, default=0, help="Anteil Requests mit 500/502/503")
+    gp.add_argument("--timeout-rate", dest="timeout_rate", type=float, default=0, help="Anteil Requests, die erst nach --timeout antworten")
+    gp.add_argument("--timeout", type=float, default=15, help="Sekunden bis zur Antwort bei simuliertem Timeout")
+    gp.add_argument("--delete-rate", dest="delete_rate", type=float, default=0, help="Anteil offener Märkte, die pro Scan-Schritt gelöscht werden")
+    gp.add_argument("--ws-port", dest="ws_port", type=int, default=0, help="Port für den Websocket-Preis-Feed (0 = aus, braucht aiohttp)")
+    gp.add_argument("--ws-drop-rate", dest="ws_drop_rate", type=float, default=0, help="Wahrscheinlichkeit pro Sekunde, dass eine Feed-Verbindung abreißt")
+    return parser
 
 if __name__ == "__main__":
     load_config()
+    args = build_cli().parse_args()
+    if args.command == "replay":
+        replay_main(args)
+        sys.exit(0)
+    if args.command == "sweep":
+        sweep_main(args)
+        sys.exit(0)
+    if args.command == "bench":
+        bench_main(args)
+        sys.exit(0)
+    if args.command == "gamma-standin":
+        standin_main(args)
+        sys.exit(0)
+
+    atexit.register(flush_data)
     # Start Update Check on Boot
     threading.Thread(target=check_for_updates_logic, daemon=True).start()
 
-    engine = Engine()
+    engine = create_engine()
     t = threading.Thread(target=engine.run, daemon=True)
     t.start()
     print(f"Server läuft auf http://127.0.0.1:{GLOBAL_CONFIG['port']}")